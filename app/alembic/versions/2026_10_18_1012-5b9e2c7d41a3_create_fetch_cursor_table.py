@@ -0,0 +1,43 @@
+"""create fetch cursor table
+
+Revision ID: 5b9e2c7d41a3
+Revises: 31c2101d970a
+Create Date: 2026-10-18 10:12:05.418230
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '5b9e2c7d41a3'
+down_revision: str | Sequence[str] | None = '31c2101d970a'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'fetch_cursors',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('seller', sa.String(length=64), nullable=False),
+        sa.Column('scope', sa.String(length=32), nullable=False),
+        sa.Column('last_created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('reconciled_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            'updated_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_fetch_cursors')),
+        sa.UniqueConstraint('seller', 'scope', name=op.f('uq_fetch_cursors_seller')),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('fetch_cursors')
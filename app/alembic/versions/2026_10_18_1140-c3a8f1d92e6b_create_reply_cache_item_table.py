@@ -0,0 +1,54 @@
+"""create reply cache item table
+
+Revision ID: c3a8f1d92e6b
+Revises: 5b9e2c7d41a3
+Create Date: 2026-10-18 11:40:27.902144
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3a8f1d92e6b'
+down_revision: str | Sequence[str] | None = '5b9e2c7d41a3'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'reply_cache_items',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('key', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=64), nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=True),
+        sa.Column('reply_text', sa.Text(), nullable=False),
+        sa.Column(
+            'created_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.Column(
+            'last_used_at',
+            sa.DateTime(timezone=True),
+            server_default=sa.text('now()'),
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk_reply_cache_items')),
+    )
+    op.create_index(
+        op.f('ix_reply_cache_items_created_at'), 'reply_cache_items', ['created_at'], unique=False
+    )
+    op.create_index(op.f('ix_reply_cache_items_key'), 'reply_cache_items', ['key'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_reply_cache_items_key'), table_name='reply_cache_items')
+    op.drop_index(op.f('ix_reply_cache_items_created_at'), table_name='reply_cache_items')
+    op.drop_table('reply_cache_items')
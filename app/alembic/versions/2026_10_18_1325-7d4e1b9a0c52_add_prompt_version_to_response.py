@@ -0,0 +1,28 @@
+"""add prompt version to response
+
+Revision ID: 7d4e1b9a0c52
+Revises: c3a8f1d92e6b
+Create Date: 2026-10-18 13:25:11.408716
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4e1b9a0c52'
+down_revision: str | Sequence[str] | None = 'c3a8f1d92e6b'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('responses', sa.Column('prompt_version', sa.String(length=16), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('responses', 'prompt_version')
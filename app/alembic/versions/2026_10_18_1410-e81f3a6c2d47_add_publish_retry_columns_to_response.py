@@ -0,0 +1,44 @@
+"""add publish retry columns to response
+
+Revision ID: e81f3a6c2d47
+Revises: 7d4e1b9a0c52
+Create Date: 2026-10-18 14:10:42.118305
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81f3a6c2d47'
+down_revision: str | Sequence[str] | None = '7d4e1b9a0c52'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'responses',
+        sa.Column('attempt_count', sa.Integer(), server_default='0', nullable=False),
+    )
+    op.add_column(
+        'responses', sa.Column('next_attempt_at', sa.DateTime(timezone=True), nullable=True)
+    )
+    op.add_column('responses', sa.Column('last_error', sa.Text(), nullable=True))
+    op.create_index(
+        'ix_responses_status_next_attempt_at',
+        'responses',
+        ['status', 'next_attempt_at'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_responses_status_next_attempt_at', table_name='responses')
+    op.drop_column('responses', 'last_error')
+    op.drop_column('responses', 'next_attempt_at')
+    op.drop_column('responses', 'attempt_count')
@@ -0,0 +1,32 @@
+"""add lease columns to review and response
+
+Revision ID: 9c2f6e4b1a75
+Revises: e81f3a6c2d47
+Create Date: 2026-10-18 15:20:07.541902
+
+"""
+
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = '9c2f6e4b1a75'
+down_revision: str | Sequence[str] | None = 'e81f3a6c2d47'
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in ('reviews', 'responses'):
+        op.add_column(table, sa.Column('claimed_by', sa.String(length=64), nullable=True))
+        op.add_column(table, sa.Column('lease_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ('responses', 'reviews'):
+        op.drop_column(table, 'lease_until')
+        op.drop_column(table, 'claimed_by')
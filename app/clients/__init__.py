@@ -1,7 +1,19 @@
+from .async_gemini_client import AsyncGeminiClient
+from .async_wb_client import AsyncWBClient
 from .gemini_client import GeminiClient
+from .latency import LatencyTracker
+from .quota import QuotaLimits, QuotaScheduler
+from .rate_limiter import RateLimitExceeded, TokenBucket
 from .wb_client import WBClient
 
 __all__ = (
+    'AsyncGeminiClient',
+    'AsyncWBClient',
     'GeminiClient',
+    'LatencyTracker',
+    'QuotaLimits',
+    'QuotaScheduler',
+    'RateLimitExceeded',
+    'TokenBucket',
     'WBClient',
 )
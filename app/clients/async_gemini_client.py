@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from google.genai import errors
+
+from app.core.logger import logger
+
+from .gemini_client import BaseGeminiClient
+from .latency import LatencyTracker
+from .quota import QuotaScheduler
+
+T = TypeVar('T')
+
+
+@dataclass
+class HedgeStats:
+    calls: int = 0
+    hedges: int = 0
+    hedge_wins: int = 0
+    timeouts: int = 0
+
+
+class AsyncGeminiClient(BaseGeminiClient):
+    """
+    - Async counterpart of GeminiClient over the SDK's async API (client.aio).
+    - deadline: every generate call raises TimeoutError after `deadline` seconds,
+      whatever the number of requests it sent.
+    - Hedging: if the first request has not answered after the hedge threshold,
+      a duplicate is sent and the first answer wins, the other request is cancelled.
+      Threshold: hedge_after seconds, or else the observed hedge_quantile latency
+      once min_samples requests were measured (no hedging before that).
+    - Cost cap: at most max_hedges duplicates per call and at most hedge_budget
+      (share of calls) duplicates overall; a hedge is only sent when the quota
+      has room for it right now.
+    - latency: distribution of successful request latencies; stats: hedge counters.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model_name: str = 'gemini-1.5-flash',
+        *,
+        deadline: float = 30.0,
+        hedge_after: float | None = None,
+        hedge_quantile: float | None = 0.95,
+        min_samples: int = 20,
+        max_hedges: int = 1,
+        hedge_budget: float = 0.1,
+        latency: LatencyTracker | None = None,
+        quota: QuotaScheduler | None = None,
+        context_cache: bool = False,
+        context_cache_ttl: int = 3600,
+        context_cache_min_tokens: int = 32_768,
+    ) -> None:
+        super().__init__(
+            api_key,
+            model_name,
+            timeout=deadline,
+            quota=quota,
+            context_cache=context_cache,
+            context_cache_ttl=context_cache_ttl,
+            context_cache_min_tokens=context_cache_min_tokens,
+        )
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.hedge_quantile = hedge_quantile
+        self.min_samples = min_samples
+        self.max_hedges = max(0, max_hedges)
+        self.hedge_budget = hedge_budget
+        self.latency = latency or LatencyTracker()
+        self.stats = HedgeStats()
+
+    def hedge_threshold(self) -> float | None:
+        if self.hedge_after is not None:
+            return self.hedge_after
+        if self.hedge_quantile is None or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.quantile(self.hedge_quantile)
+
+    def _can_hedge(self, sent: int) -> bool:
+        return sent < self.max_hedges and self.stats.hedges < self.hedge_budget * self.stats.calls
+
+    async def _timed(self, request: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await request()
+        self.latency.observe(time.monotonic() - started)
+        return result
+
+    async def _hedged(self, request: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """Run `request` within the deadline, sending hedges after the threshold."""
+        self.stats.calls += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.deadline
+        threshold = self.hedge_threshold()
+        next_hedge = loop.time() + threshold if threshold is not None else None
+        primary = asyncio.ensure_future(self._timed(request))
+        running = {primary}
+        sent = 0
+        error: BaseException | None = None
+        try:
+            while running:
+                now = loop.time()
+                if now >= deadline:
+                    self.stats.timeouts += 1
+                    raise TimeoutError(f'Gemini did not answer within {self.deadline}s')
+                wake = deadline
+                if next_hedge is not None and self._can_hedge(sent):
+                    wake = min(wake, next_hedge)
+                done, _ = await asyncio.wait(
+                    running, timeout=max(0.0, wake - now), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    running.discard(task)
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+                    logger.warning('Gemini request failed: %s', error)
+
+                if (
+                    not done
+                    and next_hedge is not None
+                    and loop.time() >= next_hedge
+                    and self._can_hedge(sent)
+                ):
+                    next_hedge = loop.time() + max(threshold or 0.0, 0.05)
+                    if self.quota.try_acquire(self.model_name, tokens):
+                        sent += 1
+                        self.stats.hedges += 1
+                        logger.debug('Gemini slower than %.2fs, sending hedge #%s', threshold, sent)
+                        running.add(asyncio.ensure_future(self._timed(request)))
+        finally:
+            for task in running:
+                task.cancel()
+            # one reservation is settled by the caller against the winning answer;
+            # the ones taken for hedges are given back, won, lost or cancelled
+            if sent:
+                self.quota.refund(self.model_name, tokens * sent)
+        if error is None:  # not reachable: the loop only ends when every request failed
+            raise RuntimeError('Gemini request produced no result')
+        raise error
+
+    async def _prepare_context(self, system_instruction: str | None) -> None:
+        if not system_instruction or not self._needs_context(system_instruction):
+            return
+        try:
+            cached = await self.client.aio.caches.create(
+                model=self.model_name, config=self._cache_config(system_instruction)
+            )
+        except Exception as e:
+            self._context_failed(system_instruction, e)
+        else:
+            self._store_context(system_instruction, cached)
+
+    async def _send(
+        self,
+        prompt: str,
+        system_instruction: str | None,
+        request: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        await self._prepare_context(system_instruction)
+        tokens = self.quota.estimate_tokens(prompt + (system_instruction or ''))
+        await self.quota.acquire_async(self.model_name, tokens)
+        try:
+            response = await self._hedged(request, tokens)
+        except errors.APIError as e:
+            if e.code == 429:
+                raise self._rate_limited(e) from e
+            logger.error('Gemini API request failed: %s', e)
+            raise
+        except Exception as e:
+            logger.error('Gemini API request failed: %s', e)
+            raise
+        self.quota.settle(self.model_name, tokens, self._used_tokens(response))
+        return response
+
+    async def generate(self, prompt: str, system_instruction: str | None = None) -> str:
+        logger.debug('Sending prompt to Gemini: %s', prompt[:200])
+        response = await self._send(
+            prompt,
+            system_instruction,
+            lambda: self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=self._config(system_instruction),
+            ),
+        )
+        return self._text(response)
+
+    async def generate_json(
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system_instruction: str | None = None,
+    ) -> Any:
+        logger.debug('Sending JSON prompt to Gemini: %s', prompt[:200])
+        response = await self._send(
+            prompt,
+            system_instruction,
+            lambda: self.client.aio.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=self._config(system_instruction, json_schema=schema, json_output=True),
+            ),
+        )
+        return self._json(response)
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+from collections.abc import AsyncIterator, Awaitable, Callable
+from typing import Any, TypeVar
+
+from app.core.logger import logger
+
+from .interfaces import HttpxAsyncClient, IAsyncApiClient, IAsyncReviewApi
+from .rate_limiter import RateLimitExceeded, TokenBucket
+from .wb_client import BaseWBClient
+
+T = TypeVar('T')
+
+
+class AsyncWBClient(BaseWBClient, IAsyncReviewApi):
+    """
+    - Async counterpart of WBClient over IAsyncApiClient.
+    - Same rate-limit semantics: shared TokenBucket (may be the one of a WBClient),
+      429 responses pause the bucket and the request is retried.
+    - list_feedbacks / list_feedback_pages are async generators.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        transport: IAsyncApiClient,
+        timeout: int = 30,
+        rate_limiter: TokenBucket | None = None,
+        max_rate_limit_retries: int = 3,
+    ) -> None:
+        super().__init__(token, timeout, rate_limiter, max_rate_limit_retries)
+        self.transport = transport
+        self.transport.add_response_hook(self.rate_limiter.observe)
+        logger.info('AsyncWBClient initialized with timeout=%s', timeout)
+
+    @classmethod
+    def create(cls, rate_limiter: TokenBucket | None = None) -> AsyncWBClient:
+        logger.info('Creating AsyncWBClient with token from settings')
+        return cls(
+            token=cls._settings_token(),
+            transport=HttpxAsyncClient(),
+            rate_limiter=rate_limiter,
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+    async def __aenter__(self) -> AsyncWBClient:
+        return self
+
+    async def __aexit__(self, *_: object) -> None:
+        await self.aclose()
+
+    async def _call(self, request: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """Run one transport request within the rate limit, retrying on 429."""
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire_async()
+            try:
+                return await request(*args, **kwargs)
+            except RateLimitExceeded as e:
+                attempt += 1
+                if attempt > self.max_rate_limit_retries:
+                    raise
+                self._log_rate_limited(attempt, e)
+
+    async def list_feedbacks(
+        self,
+        *,
+        is_answered: bool,
+        date_from: int | None = None,
+        date_to: int | None = None,
+        order: str = 'dateDesc',
+        page_size: int = 1000,
+        max_total: int = 10000,
+        nm_id: int | None = None,
+    ) -> AsyncIterator[dict]:
+        """
+        GET /api/v1/feedbacks
+        - Returns an async generator of elements from data.feedbacks (dict).
+        """
+        async for page in self.list_feedback_pages(
+            is_answered=is_answered,
+            date_from=date_from,
+            date_to=date_to,
+            order=order,
+            page_size=page_size,
+            max_total=max_total,
+            nm_id=nm_id,
+        ):
+            for item in page:
+                yield item
+
+    async def list_feedback_pages(
+        self,
+        *,
+        is_answered: bool,
+        date_from: int | None = None,
+        date_to: int | None = None,
+        order: str = 'dateDesc',
+        page_size: int = 1000,
+        max_total: int = 10000,
+        nm_id: int | None = None,
+    ) -> AsyncIterator[list[dict]]:
+        """
+        GET /api/v1/feedbacks
+        - Returns an async generator of pages (lists of data.feedbacks).
+        - The next page is requested only when the consumer asks for it.
+        """
+        if not (1 <= page_size <= 5000):
+            raise ValueError('Page size must be between 1 and 5000.')
+
+        logger.info(
+            'Fetching WB feedbacks (async): answered=%s, page_size=%s, max_total=%s, nm_id=%s',
+            is_answered,
+            page_size,
+            max_total,
+            nm_id,
+        )
+
+        skip = 0
+        taken = 0
+        url = f'{self.BASE_URL}/api/v1/feedbacks'
+
+        while taken < max_total:
+            params = self._page_params(
+                is_answered=is_answered,
+                take=min(page_size, max_total - taken),
+                skip=skip,
+                order=order,
+                date_from=date_from,
+                date_to=date_to,
+                nm_id=nm_id,
+            )
+            logger.debug('Requesting %s with params=%s', url, params)
+
+            payload = await self._call(
+                self.transport.get,
+                url,
+                headers=self._headers(),
+                params=params,
+                timeout=self.timeout,
+            )
+            items = self._page_items(payload)
+
+            if not items:
+                logger.info('No more feedbacks found (skip=%s, taken=%s)', skip, taken)
+                break
+
+            logger.info('Fetched %s feedbacks (skip=%s, taken=%s)', len(items), skip, taken)
+            yield items
+
+            taken += len(items)
+            skip += len(items)
+
+        logger.info('Finished fetching feedbacks, total=%s', taken)
+
+    async def reply_to_feedback(
+        self,
+        feedback_id: str | int,
+        text: str,
+    ) -> None:
+        """
+        POST /api/v1/feedbacks/answer
+        Body: {"id": "<feedback_id>", "text": "<answer_text>"}
+        """
+        url = f'{self.BASE_URL}/api/v1/feedbacks/answer'
+        logger.info('Replying to feedback %s with text=%s', feedback_id, text[:100])
+
+        await self._call(
+            self.transport.post,
+            url=url,
+            headers=self._headers(),
+            json={'id': str(feedback_id), 'text': text},
+            timeout=self.timeout,
+        )
+
+        logger.debug('Reply successfully sent to feedback %s', feedback_id)
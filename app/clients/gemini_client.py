@@ -1,34 +1,142 @@
 # app/clients/gemini_client.py
 from __future__ import annotations
 
+import json
+import re
+import time
+from collections.abc import Callable
 from typing import Any
 
 from google import genai
+from google.genai import errors, types
 
 from app.core.config import settings
 from app.core.logger import logger
 
+from .quota import QuotaScheduler
+from .rate_limiter import RateLimitExceeded
 
-class GeminiClient:
-    def __init__(self, api_key: str | None = None, model_name: str = 'gemini-1.5-flash') -> None:
+_RETRY_DELAY = re.compile(r"'retryDelay': '([\d.]+)s'")
+
+
+class BaseGeminiClient:
+    """
+    Shared part of the sync and async Gemini clients: credentials, SDK client,
+    request config and response parsing.
+    timeout — per-request deadline in seconds, enforced by the SDK transport.
+    quota — client-side RPM/TPM budget (may be shared between clients); requests wait
+    for it before they are sent, a 429 pauses the model and raises RateLimitExceeded.
+    system_instruction — static prompt part, sent apart from the contents; with
+    context_cache=True it is stored once in the SDK's context cache (renewed before
+    its ttl runs out) and requests only reference it. Instructions estimated below
+    context_cache_min_tokens (the API minimum, 32k tokens for gemini-1.5) are not sent
+    to the cache at all; anything else the cache rejects falls back to a plain
+    system_instruction as well.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model_name: str = 'gemini-1.5-flash',
+        timeout: float | None = None,
+        quota: QuotaScheduler | None = None,
+        *,
+        context_cache: bool = False,
+        context_cache_ttl: int = 3600,
+        context_cache_min_tokens: int = 32_768,
+    ) -> None:
         self.api_key = api_key or settings.api_keys.gemini_token
         if not self.api_key:
             raise RuntimeError('Gemini token is missing (settings.api_keys.gemini_token)')
         self.model_name = model_name
-        self.client = genai.Client(api_key=self.api_key)
-        logger.info('GeminiClient initialized with model=%s', self.model_name)
+        self.timeout = timeout
+        self.quota = quota or QuotaScheduler()
+        self.context_cache = context_cache
+        self.context_cache_ttl = context_cache_ttl
+        self.context_cache_min_tokens = context_cache_min_tokens
+        # system_instruction -> (cached content name or None if not cacheable, expires at)
+        self._contexts: dict[str, tuple[str | None, float]] = {}
+        http_options = types.HttpOptions(timeout=int(timeout * 1000)) if timeout else None
+        self.client = genai.Client(api_key=self.api_key, http_options=http_options)
+        logger.info('%s initialized with model=%s', type(self).__name__, self.model_name)
 
-    def generate(self, prompt: str) -> str:
-        logger.debug('Sending prompt to Gemini: %s', prompt[:200])
-        try:
-            response: Any = self.client.models.generate_content(
-                model=self.model_name,
-                contents=prompt,
-            )
-        except Exception as e:
-            logger.error('Gemini API request failed: %s', e)
-            raise
+    def _cache_config(self, system_instruction: str) -> types.CreateCachedContentConfig:
+        return types.CreateCachedContentConfig(
+            system_instruction=system_instruction,
+            ttl=f'{self.context_cache_ttl}s',
+        )
+
+    def _live_context(self, system_instruction: str) -> tuple[str | None, float] | None:
+        entry = self._contexts.get(system_instruction)
+        # a cached context is renewed a minute before its ttl runs out
+        if entry is None or (entry[0] is not None and entry[1] - 60 <= time.monotonic()):
+            return None
+        return entry
+
+    def _needs_context(self, system_instruction: str | None) -> bool:
+        if not (
+            self.context_cache
+            and system_instruction
+            and self._live_context(system_instruction) is None
+        ):
+            return False
+        tokens = self.quota.estimate_tokens(system_instruction, output_tokens=0)
+        if tokens < self.context_cache_min_tokens:
+            # a create call would only be rejected: send it as system_instruction
+            self._contexts[system_instruction] = (None, float('inf'))
+            return False
+        return True
+
+    def _store_context(self, system_instruction: str, cached: Any) -> None:
+        name = getattr(cached, 'name', None)
+        self._contexts[system_instruction] = (name, time.monotonic() + self.context_cache_ttl)
+        if name:
+            logger.info('Gemini context cached for %s: %s', self.model_name, name)
+
+    def _context_failed(self, system_instruction: str, error: Exception) -> None:
+        logger.warning(
+            'Gemini context cache is not available for %s, sending system_instruction: %s',
+            self.model_name,
+            error,
+        )
+        self._contexts[system_instruction] = (None, float('inf'))
 
+    def _config(
+        self,
+        system_instruction: str | None = None,
+        *,
+        json_schema: dict[str, Any] | None = None,
+        json_output: bool = False,
+    ) -> types.GenerateContentConfig | None:
+        entry = self._live_context(system_instruction) if system_instruction else None
+        cached = entry[0] if entry else None
+        options: dict[str, Any] = {}
+        if cached:
+            options['cached_content'] = cached
+        elif system_instruction:
+            options['system_instruction'] = system_instruction
+        if json_output:
+            options['response_mime_type'] = 'application/json'
+            options['response_schema'] = json_schema
+        return types.GenerateContentConfig(**options) if options else None
+
+    @staticmethod
+    def _used_tokens(response: Any) -> int | None:
+        usage = getattr(response, 'usage_metadata', None)
+        total = getattr(usage, 'total_token_count', None)
+        return total if isinstance(total, int) else None
+
+    def _rate_limited(self, error: errors.APIError) -> RateLimitExceeded:
+        # Gemini puts the delay into RetryInfo details: {'retryDelay': '17s'}
+        match = _RETRY_DELAY.search(str(error.details))
+        retry_after = float(match.group(1)) if match else None
+        self.quota.penalize(self.model_name, retry_after)
+        return RateLimitExceeded(
+            f'Gemini quota exceeded for {self.model_name}', retry_after=retry_after
+        )
+
+    @staticmethod
+    def _text(response: Any) -> str:
         text = getattr(response, 'text', None)
         if isinstance(text, str) and text.strip():
             out = text.strip()
@@ -37,3 +145,77 @@ class GeminiClient:
 
         logger.error('Unexpected Gemini response (no .text): %r', response)
         raise RuntimeError('Unexpected Gemini response: missing text')
+
+    @classmethod
+    def _json(cls, response: Any) -> Any:
+        text = cls._text(response)
+        try:
+            return json.loads(text)
+        except ValueError as e:
+            raise RuntimeError(f'Gemini returned invalid JSON: {text[:200]!r}') from e
+
+
+class GeminiClient(BaseGeminiClient):
+    def _prepare_context(self, system_instruction: str | None) -> None:
+        if not system_instruction or not self._needs_context(system_instruction):
+            return
+        try:
+            cached = self.client.caches.create(
+                model=self.model_name, config=self._cache_config(system_instruction)
+            )
+        except Exception as e:
+            self._context_failed(system_instruction, e)
+        else:
+            self._store_context(system_instruction, cached)
+
+    def _send(self, prompt: str, system_instruction: str | None, request: Callable[[], Any]) -> Any:
+        self._prepare_context(system_instruction)
+        tokens = self.quota.estimate_tokens(prompt + (system_instruction or ''))
+        self.quota.acquire(self.model_name, tokens)
+        try:
+            response = request()
+        except errors.APIError as e:
+            if e.code == 429:
+                raise self._rate_limited(e) from e
+            logger.error('Gemini API request failed: %s', e)
+            raise
+        except Exception as e:
+            logger.error('Gemini API request failed: %s', e)
+            raise
+        self.quota.settle(self.model_name, tokens, self._used_tokens(response))
+        return response
+
+    def generate(self, prompt: str, system_instruction: str | None = None) -> str:
+        logger.debug('Sending prompt to Gemini: %s', prompt[:200])
+        response = self._send(
+            prompt,
+            system_instruction,
+            lambda: self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=self._config(system_instruction),
+            ),
+        )
+        return self._text(response)
+
+    def generate_json(
+        self,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system_instruction: str | None = None,
+    ) -> Any:
+        """
+        Structured output: the model is asked for application/json
+        (optionally constrained by `schema`), the decoded JSON is returned.
+        """
+        logger.debug('Sending JSON prompt to Gemini: %s', prompt[:200])
+        response = self._send(
+            prompt,
+            system_instruction,
+            lambda: self.client.models.generate_content(
+                model=self.model_name,
+                contents=prompt,
+                config=self._config(system_instruction, json_schema=schema, json_output=True),
+            ),
+        )
+        return self._json(response)
@@ -1,17 +1,66 @@
 from __future__ import annotations
 
+import json as jsonlib
 from abc import ABC, abstractmethod
-from collections.abc import Iterator, Mapping
+from collections.abc import AsyncIterator, Callable, Generator, Iterator, Mapping
 from typing import Any
 
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from .rate_limiter import RateLimitExceeded, parse_retry_after
 
-class IApiClient(ABC):
+try:
+    import orjson
+except ImportError:  # optional: faster JSON decoding when installed
+    orjson = None
+
+# (status_code, headers) of every HTTP response, e.g. TokenBucket.observe
+ResponseHook = Callable[[int, Mapping[str, str]], None]
+
+
+def loads_json(content: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(content)
+    return jsonlib.loads(content)
+
+
+class ResponseHooksMixin:
+    """
+    Transports report every response to the registered hooks
+    and raise RateLimitExceeded on 429.
+    """
+
+    def __init__(self) -> None:
+        self.response_hooks: list[ResponseHook] = []
+
+    def add_response_hook(self, hook: ResponseHook) -> None:
+        if hook not in self.response_hooks:
+            self.response_hooks.append(hook)
+
+    def _notify(self, status_code: int, headers: Mapping[str, str]) -> None:
+        for hook in self.response_hooks:
+            hook(status_code, headers)
+
+    def _check_status(self, status_code: int, headers: Mapping[str, str], url: Any) -> None:
+        self._notify(status_code, headers)
+        if status_code == 429:
+            raise RateLimitExceeded(
+                f'429 Too Many Requests: {url}',
+                retry_after=parse_retry_after(headers),
+            )
+
+
+class IApiClient(ResponseHooksMixin, ABC):
     """
     Abstract transport class for HTTP-requests
     """
 
+    def close(self) -> None:
+        """Release network resources (connection pools); no-op by default."""
+
     @abstractmethod
     def get(
         self,
@@ -35,9 +84,18 @@ class IApiClient(ABC):
 
 class RequestsClient(IApiClient):
     """
-    Implementing transport via requests
+    Implementing transport via requests: module-level calls by default,
+    or any requests.Session passed as `requester`.
+    JSON is decoded with orjson when it is installed.
     """
 
+    def __init__(self, requester: Any = requests) -> None:
+        super().__init__()
+        self.requester = requester
+
+    def _check_rate_limit(self, response: requests.Response) -> None:
+        self._check_status(response.status_code, response.headers, response.url)
+
     def get(
         self,
         url: str,
@@ -46,9 +104,10 @@ class RequestsClient(IApiClient):
         params=None,
         timeout: int = 30,
     ) -> dict:
-        response = requests.get(url, headers=headers, params=params, timeout=timeout)
+        response = self.requester.get(url, headers=headers, params=params, timeout=timeout)
+        self._check_rate_limit(response)
         response.raise_for_status()
-        return response.json()
+        return loads_json(response.content)
 
     def post(
         self,
@@ -58,15 +117,132 @@ class RequestsClient(IApiClient):
         json=None,
         timeout: int = 30,
     ) -> dict | None:
-        response = requests.post(url, headers=headers, json=json, timeout=timeout)
+        response = self.requester.post(url, headers=headers, json=json, timeout=timeout)
+        self._check_rate_limit(response)
         if response.status_code not in (200, 204):
             response.raise_for_status()
         try:
-            return response.json()
+            return loads_json(response.content)
         except ValueError:
             return None
 
 
+class PooledRequestsClient(RequestsClient):
+    """
+    Implementing transport via one requests.Session:
+    - keep-alive connection pool of pool_size connections (no TCP/TLS handshake per call);
+    - transport-level retries with backoff for idempotent GETs on 5xx
+      (429 is left to the rate limiter);
+    - gzip responses.
+    Call close() to release the sockets of a long-running process.
+    """
+
+    def __init__(
+        self,
+        *,
+        pool_size: int = 10,
+        retries: int = 3,
+        backoff_factor: float = 0.3,
+    ) -> None:
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({'GET'}),
+            respect_retry_after_header=False,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        super().__init__(requester=self.session)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class IAsyncApiClient(ResponseHooksMixin, ABC):
+    """
+    Abstract async transport class for HTTP-requests
+    """
+
+    async def aclose(self) -> None:
+        """Release network resources (connection pools); no-op by default."""
+
+    @abstractmethod
+    async def get(
+        self,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None = None,
+        params: Mapping[str, Any] | None = None,
+        timeout: int = 30,
+    ) -> dict: ...
+
+    @abstractmethod
+    async def post(
+        self,
+        url: str,
+        *,
+        headers: Mapping[str, str] | None = None,
+        json: Mapping[str, Any] | None = None,
+        timeout: int = 30,
+    ) -> dict | None: ...
+
+
+class HttpxAsyncClient(IAsyncApiClient):
+    """
+    Implementing async transport via one httpx.AsyncClient:
+    keep-alive pool of pool_size connections, gzip (httpx default),
+    retries of failed connection attempts, JSON decoded with orjson when installed.
+    """
+
+    def __init__(self, *, pool_size: int = 10, retries: int = 3) -> None:
+        super().__init__()
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool_size,
+                max_keepalive_connections=pool_size,
+            ),
+            transport=httpx.AsyncHTTPTransport(retries=retries),
+        )
+
+    async def get(
+        self,
+        url: str,
+        *,
+        headers=None,
+        params=None,
+        timeout: int = 30,
+    ) -> dict:
+        response = await self.client.get(url, headers=headers, params=params, timeout=timeout)
+        self._check_status(response.status_code, response.headers, response.url)
+        response.raise_for_status()
+        return loads_json(response.content)
+
+    async def post(
+        self,
+        url: str,
+        *,
+        headers=None,
+        json=None,
+        timeout: int = 30,
+    ) -> dict | None:
+        response = await self.client.post(url, headers=headers, json=json, timeout=timeout)
+        self._check_status(response.status_code, response.headers, response.url)
+        if response.status_code not in (200, 204):
+            response.raise_for_status()
+        try:
+            return loads_json(response.content)
+        except ValueError:
+            return None
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
 class IReviewApi(ABC):
     """
     Interface for working with WB reviews
@@ -83,12 +259,67 @@ class IReviewApi(ABC):
         page_size: int = 1000,
         max_total: int = 10000,
         nm_id: int | None = None,
-        sleep_between_pages: float = 0.2,
+        sleep_between_pages: float = 0.0,
+        prefetch: int = 0,
     ) -> Iterator[dict]: ...
 
+    @abstractmethod
+    def list_feedback_pages(
+        self,
+        *,
+        is_answered: bool,
+        date_from: int | None = None,
+        date_to: int | None = None,
+        order: str = 'dateDesc',
+        page_size: int = 1000,
+        max_total: int = 10000,
+        nm_id: int | None = None,
+        sleep_between_pages: float = 0.0,
+        prefetch: int = 0,
+    ) -> Generator[list[dict]]: ...
+
     @abstractmethod
     def reply_to_feedback(
         self,
         feedback_id: str | int,
         text: str,
     ) -> None: ...
+
+
+class IAsyncReviewApi(ABC):
+    """
+    Async interface for working with WB reviews
+    """
+
+    @abstractmethod
+    def list_feedbacks(
+        self,
+        *,
+        is_answered: bool,
+        date_from: int | None = None,
+        date_to: int | None = None,
+        order: str = 'dateDesc',
+        page_size: int = 1000,
+        max_total: int = 10000,
+        nm_id: int | None = None,
+    ) -> AsyncIterator[dict]: ...
+
+    @abstractmethod
+    def list_feedback_pages(
+        self,
+        *,
+        is_answered: bool,
+        date_from: int | None = None,
+        date_to: int | None = None,
+        order: str = 'dateDesc',
+        page_size: int = 1000,
+        max_total: int = 10000,
+        nm_id: int | None = None,
+    ) -> AsyncIterator[list[dict]]: ...
+
+    @abstractmethod
+    async def reply_to_feedback(
+        self,
+        feedback_id: str | int,
+        text: str,
+    ) -> None: ...
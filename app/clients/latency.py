@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    Sliding window of the last `window` request latencies (seconds), thread-safe.
+    quantile() / snapshot() expose the distribution, e.g. to pick a hedge threshold.
+    """
+
+    def __init__(self, window: int = 500) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def quantile(self, q: float) -> float | None:
+        """Nearest-rank quantile, None while there are no samples."""
+        with self._lock:
+            ordered = sorted(self._samples)
+        if not ordered:
+            return None
+        rank = min(len(ordered), max(1, math.ceil(q * len(ordered))))
+        return ordered[rank - 1]
+
+    def snapshot(self) -> dict[str, float | None]:
+        return {
+            'count': float(len(self)),
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'p99': self.quantile(0.99),
+        }
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+@dataclass(frozen=True)
+class QuotaLimits:
+    """Per-model budget; None means unlimited."""
+
+    rpm: int | None = None
+    tpm: int | None = None
+
+
+class _Budget:
+    def __init__(self, limits: QuotaLimits, window: float) -> None:
+        self.limits = limits
+        self.window = window
+        # (monotonic time, requests, tokens); token corrections are entries with 0 requests
+        self.log: deque[tuple[float, int, int]] = deque()
+        self.requests = 0
+        self.tokens = 0
+        self.paused_until = 0.0
+
+    def _expire(self, now: float) -> None:
+        while self.log and self.log[0][0] <= now - self.window:
+            _, requests, tokens = self.log.popleft()
+            self.requests -= requests
+            self.tokens -= tokens
+
+    def record(self, now: float, requests: int, tokens: int) -> None:
+        self.log.append((now, requests, tokens))
+        self.requests += requests
+        self.tokens += tokens
+
+    def wait_time(self, now: float, tokens: int) -> float:
+        """Seconds until one request of `tokens` fits the budget, 0 if it fits now."""
+        self._expire(now)
+        wait = max(0.0, self.paused_until - now)
+        rpm, tpm = self.limits.rpm, self.limits.tpm
+        requests, used = self.requests, self.tokens
+        for at, r, t in self.log:
+            fits_rpm = rpm is None or requests + 1 <= rpm
+            # a request larger than the whole tpm budget only waits for an empty window
+            fits_tpm = tpm is None or used + tokens <= tpm or used <= 0
+            if fits_rpm and fits_tpm:
+                break
+            requests -= r
+            used -= t
+            wait = max(wait, at + self.window - now)
+        return wait
+
+
+class QuotaScheduler:
+    """
+    Client-side Gemini quota: sliding 60s window of requests (RPM) and
+    estimated tokens (TPM) per model, thread-safe.
+    - acquire() / acquire_async() block until the request fits the budget,
+      so we throttle before the API starts answering 429;
+    - try_acquire() takes the budget only if it is free right now (e.g. for hedges);
+    - settle() replaces the estimate with the real token count of the answer;
+    - refund() gives back the tokens of a discarded answer (a losing hedge); the
+      request itself still counts against RPM;
+    - penalize() pauses a model after a 429 for retry_after seconds.
+    """
+
+    def __init__(
+        self,
+        limits: Mapping[str, QuotaLimits] | None = None,
+        *,
+        default: QuotaLimits | None = None,
+        window: float = 60.0,
+        default_retry_after: float = 10.0,
+    ) -> None:
+        self.limits = dict(limits or {})
+        self.default = default or QuotaLimits()
+        self.window = window
+        self.default_retry_after = default_retry_after
+        self._budgets: dict[str, _Budget] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> QuotaScheduler:
+        """Default per-model RPM/TPM limits from settings.gemini_quota."""
+        quota = settings.gemini_quota
+        return cls(default=QuotaLimits(rpm=quota.rpm, tpm=quota.tpm))
+
+    @staticmethod
+    def estimate_tokens(prompt: str, output_tokens: int = 256) -> int:
+        # ~4 characters per token plus the expected answer
+        return len(prompt) // 4 + output_tokens
+
+    def _budget(self, model: str) -> _Budget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            budget = _Budget(self.limits.get(model, self.default), self.window)
+            self._budgets[model] = budget
+        return budget
+
+    def reserve(self, model: str, tokens: int) -> float:
+        """Take the budget if it is free and return 0, or return the seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            budget = self._budget(model)
+            wait = budget.wait_time(now, tokens)
+            if wait <= 0:
+                budget.record(now, 1, tokens)
+            return wait
+
+    def try_acquire(self, model: str, tokens: int) -> bool:
+        return self.reserve(model, tokens) <= 0
+
+    def acquire(self, model: str, tokens: int) -> None:
+        while (wait := self.reserve(model, tokens)) > 0:
+            logger.debug('Gemini quota of %s exhausted, waiting %.2fs', model, wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, model: str, tokens: int) -> None:
+        while (wait := self.reserve(model, tokens)) > 0:
+            logger.debug('Gemini quota of %s exhausted, waiting %.2fs', model, wait)
+            await asyncio.sleep(wait)
+
+    def settle(self, model: str, estimated: int, actual: int | None) -> None:
+        if actual is None or actual == estimated:
+            return
+        with self._lock:
+            self._budget(model).record(time.monotonic(), 0, actual - estimated)
+
+    def refund(self, model: str, tokens: int) -> None:
+        self.settle(model, tokens, 0)
+
+    def penalize(self, model: str, retry_after: float | None = None) -> None:
+        delay = self.default_retry_after if retry_after is None else retry_after
+        with self._lock:
+            budget = self._budget(model)
+            budget.paused_until = max(budget.paused_until, time.monotonic() + delay)
+        logger.warning('Gemini quota hit for %s: pausing for %.2fs', model, delay)
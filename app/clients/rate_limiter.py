@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import threading
+import time
+from collections.abc import Mapping
+from email.utils import parsedate_to_datetime
+
+from app.core.logger import logger
+
+
+class RateLimitExceeded(Exception):
+    """
+    The remote API answered 429 Too Many Requests.
+    retry_after — seconds to wait before the next request, if the API told us.
+    """
+
+    def __init__(self, message: str = 'Rate limit exceeded', *, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> float | None:
+    """
+    Seconds to wait from Retry-After (seconds or HTTP-date)
+    or WB's X-Ratelimit-Retry / X-Ratelimit-Reset.
+    """
+    for name in ('Retry-After', 'X-Ratelimit-Retry', 'X-Ratelimit-Reset'):
+        value = headers.get(name)
+        if not value:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            when = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            continue
+        return max(0.0, (when - datetime.datetime.now(datetime.UTC)).total_seconds())
+    return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every call of one API (WB: ~3 rps, burst ~6).
+    - acquire() blocks until a token is available; tokens are reserved under the lock
+      and waited for outside of it, so concurrent callers queue up fairly.
+      acquire_async() is the same for coroutines; one bucket may serve both.
+    - observe() is a transport response hook: 429 / Retry-After pause the bucket and
+      halve the rate, successful responses restore it step by step (AIMD),
+      X-Ratelimit-Remaining / X-Ratelimit-Limit keep the bucket in sync with the server.
+    """
+
+    def __init__(
+        self,
+        rate: float = 3.0,
+        burst: int = 6,
+        *,
+        min_rate: float = 0.5,
+        recovery_step: float = 0.1,
+        default_retry_after: float = 1.0,
+    ) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError('rate must be > 0 and burst >= 1')
+        self.max_rate = rate
+        self.rate = rate
+        self.max_burst = burst
+        self.burst = burst
+        self.min_rate = min(min_rate, rate)
+        self.recovery_step = recovery_step
+        self.default_retry_after = default_retry_after
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        # _updated may be in the future while the bucket is paused after a 429
+        if now > self._updated:
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+    def reserve(self) -> float:
+        """Take one token and return how many seconds to wait before using it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1
+            wait = max(0.0, self._updated - now)
+            if self._tokens < 0:
+                wait += -self._tokens / self.rate
+            return wait
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def penalize(self, retry_after: float | None = None) -> None:
+        """Pause the bucket for retry_after seconds and halve the rate."""
+        delay = self.default_retry_after if retry_after is None else retry_after
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._updated = max(self._updated, now + delay)
+            self._tokens = min(self._tokens, 0.0)
+            self.rate = max(self.min_rate, self.rate / 2)
+        logger.warning('Rate limit hit: pausing for %.2fs, rate=%.2f rps', delay, self.rate)
+
+    def observe(self, status_code: int, headers: Mapping[str, str]) -> None:
+        if status_code == 429:
+            self.penalize(parse_retry_after(headers))
+            return
+        if status_code >= 400:
+            return
+
+        remaining = headers.get('X-Ratelimit-Remaining')
+        limit = headers.get('X-Ratelimit-Limit')
+        with self._lock:
+            self._refill(time.monotonic())
+            if limit and limit.isdigit() and int(limit) > 0:
+                self.burst = min(self.max_burst, int(limit))
+            if remaining and remaining.isdigit():
+                self._tokens = min(self._tokens, float(remaining))
+            self.rate = min(self.max_rate, self.rate + self.recovery_step)
@@ -1,20 +1,23 @@
 from __future__ import annotations
 
 import time
-from collections.abc import Iterator
-from typing import Any
+from collections.abc import Callable, Generator, Iterator
+from typing import Any, TypeVar
 
 from app.core.config import settings
 from app.core.logger import logger
+from app.utils.prefetch import prefetch as prefetch_pages
 
-from .interfaces import IApiClient, IReviewApi, RequestsClient
+from .interfaces import IApiClient, IReviewApi, PooledRequestsClient
+from .rate_limiter import RateLimitExceeded, TokenBucket
 
+T = TypeVar('T')
 
-class WBClient(IReviewApi):
+
+class BaseWBClient:
     """
-    - Depends on IApiClient abstraction (transport can be substituted).
-    - WBClient.create() — convenient to collect from settings
-    - Generator list_feedbacks page by page and carefully to rate limit WB (~3 rps, burst ~6)
+    Transport-independent part of the WB feedbacks API shared by WBClient and AsyncWBClient:
+    auth headers, request parameters, response parsing and the shared rate limiter.
     """
 
     BASE_URL = 'https://feedbacks-api.wildberries.ru'
@@ -22,21 +25,21 @@ class WBClient(IReviewApi):
     def __init__(
         self,
         token: str,
-        transport: IApiClient,
         timeout: int = 30,
+        rate_limiter: TokenBucket | None = None,
+        max_rate_limit_retries: int = 3,
     ) -> None:
         self.token = token
-        self.transport = transport
         self.timeout = timeout
-        logger.info('WBClient initialized with timeout=%s', timeout)
+        self.rate_limiter = rate_limiter or TokenBucket(rate=3.0, burst=6)
+        self.max_rate_limit_retries = max_rate_limit_retries
 
-    @classmethod
-    def create(cls) -> WBClient:
+    @staticmethod
+    def _settings_token() -> str:
         token = settings.api_keys.wb_token
         if not token:
             raise RuntimeError('WB Token is missing (settings.api_keys.wb_token)')
-        logger.info('Creating WBClient with token from settings')
-        return cls(token=token, transport=RequestsClient())
+        return token
 
     def _headers(self) -> dict[str, str]:
         return {
@@ -44,6 +47,88 @@ class WBClient(IReviewApi):
             'Content-Type': 'application/json',
         }
 
+    @staticmethod
+    def _page_params(
+        *,
+        is_answered: bool,
+        take: int,
+        skip: int,
+        order: str,
+        date_from: int | None,
+        date_to: int | None,
+        nm_id: int | None,
+    ) -> dict[str, Any]:
+        params: dict[str, Any] = {
+            'isAnswered': str(is_answered).lower(),
+            'take': take,
+            'skip': skip,
+            'order': order,
+        }
+
+        if date_from is not None:
+            params['dateFrom'] = int(date_from)
+        if date_to is not None:
+            params['dateTo'] = int(date_to)
+        if nm_id is not None:
+            params['nmId'] = int(nm_id)
+        return params
+
+    @staticmethod
+    def _page_items(payload: dict) -> list[dict]:
+        return (payload.get('data') or {}).get('feedbacks') or []
+
+    def _log_rate_limited(self, attempt: int, e: RateLimitExceeded) -> None:
+        logger.warning(
+            'WB rate limit exceeded (attempt %d/%d, retry_after=%s)',
+            attempt,
+            self.max_rate_limit_retries,
+            e.retry_after,
+        )
+
+
+class WBClient(BaseWBClient, IReviewApi):
+    """
+    - Depends on IApiClient abstraction (transport can be substituted).
+    - WBClient.create() — convenient to collect from settings
+    - Generator list_feedbacks page by page and carefully to rate limit WB (~3 rps, burst ~6)
+    - Every request takes a token from one shared TokenBucket (thread-safe);
+      429 responses pause the bucket and the request is retried.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        transport: IApiClient,
+        timeout: int = 30,
+        rate_limiter: TokenBucket | None = None,
+        max_rate_limit_retries: int = 3,
+    ) -> None:
+        super().__init__(token, timeout, rate_limiter, max_rate_limit_retries)
+        self.transport = transport
+        self.transport.add_response_hook(self.rate_limiter.observe)
+        logger.info('WBClient initialized with timeout=%s', timeout)
+
+    @classmethod
+    def create(cls) -> WBClient:
+        logger.info('Creating WBClient with token from settings')
+        return cls(token=cls._settings_token(), transport=PooledRequestsClient())
+
+    def close(self) -> None:
+        self.transport.close()
+
+    def _call(self, request: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run one transport request within the rate limit, retrying on 429."""
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                return request(*args, **kwargs)
+            except RateLimitExceeded as e:
+                attempt += 1
+                if attempt > self.max_rate_limit_retries:
+                    raise
+                self._log_rate_limited(attempt, e)
+
     def list_feedbacks(
         self,
         *,
@@ -54,54 +139,111 @@ class WBClient(IReviewApi):
         page_size: int = 1000,
         max_total: int = 10000,
         nm_id: int | None = None,
-        sleep_between_pages: float = 0.2,
+        sleep_between_pages: float = 0.0,
+        prefetch: int = 0,
     ) -> Iterator[dict]:
         """
         GET /api/v1/feedbacks
         - Returns a generator of elements from data.feedbacks (dict).
+        - Flat view over list_feedback_pages.
+        """
+        for page in self.list_feedback_pages(
+            is_answered=is_answered,
+            date_from=date_from,
+            date_to=date_to,
+            order=order,
+            page_size=page_size,
+            max_total=max_total,
+            nm_id=nm_id,
+            sleep_between_pages=sleep_between_pages,
+            prefetch=prefetch,
+        ):
+            yield from page
+
+    def list_feedback_pages(
+        self,
+        *,
+        is_answered: bool,
+        date_from: int | None = None,
+        date_to: int | None = None,
+        order: str = 'dateDesc',
+        page_size: int = 1000,
+        max_total: int = 10000,
+        nm_id: int | None = None,
+        sleep_between_pages: float = 0.0,
+        prefetch: int = 0,
+    ) -> Generator[list[dict]]:
+        """
+        GET /api/v1/feedbacks
+        - Returns a generator of pages: each page is the list data.feedbacks (dict).
         - Mandatory parameters for WB: isAnswered, take, skip (we generate them).
         - Supported: order, dateFrom, dateTo, nmId.
+        - The next page is requested only when the consumer asks for it,
+          unless prefetch=N: then up to N pages are fetched in a background thread
+          (within the rate limit) while the consumer processes the current one.
         """
         if not (1 <= page_size <= 5000):
             raise ValueError('Page size must be between 1 and 5000.')
 
         logger.info(
-            'Fetching WB feedbacks: answered=%s, page_size=%s, max_total=%s, nm_id=%s',
+            'Fetching WB feedbacks: answered=%s, page_size=%s, max_total=%s, nm_id=%s, prefetch=%s',
             is_answered,
             page_size,
             max_total,
             nm_id,
+            prefetch,
+        )
+
+        pages = self._iter_pages(
+            is_answered=is_answered,
+            date_from=date_from,
+            date_to=date_to,
+            order=order,
+            page_size=page_size,
+            max_total=max_total,
+            nm_id=nm_id,
+            sleep_between_pages=sleep_between_pages,
         )
+        yield from prefetch_pages(pages, prefetch)
 
+    def _iter_pages(
+        self,
+        *,
+        is_answered: bool,
+        date_from: int | None,
+        date_to: int | None,
+        order: str,
+        page_size: int,
+        max_total: int,
+        nm_id: int | None,
+        sleep_between_pages: float,
+    ) -> Generator[list[dict]]:
         skip = 0
         taken = 0
 
         while taken < max_total:
             take = min(page_size, max_total - taken)
-            params: dict[str, Any] = {
-                'isAnswered': str(is_answered).lower(),
-                'take': take,
-                'skip': skip,
-                'order': order,
-            }
-
-            if date_from is not None:
-                params['dateFrom'] = int(date_from)
-            if date_to is not None:
-                params['dateTo'] = int(date_to)
-            if nm_id is not None:
-                params['nmId'] = int(nm_id)
+            params = self._page_params(
+                is_answered=is_answered,
+                take=take,
+                skip=skip,
+                order=order,
+                date_from=date_from,
+                date_to=date_to,
+                nm_id=nm_id,
+            )
 
             url = f'{self.BASE_URL}/api/v1/feedbacks'
             logger.debug('Requesting %s with params=%s', url, params)
 
-            payload = self.transport.get(
+            payload = self._call(
+                self.transport.get,
                 url,
                 headers=self._headers(),
                 params=params,
                 timeout=self.timeout,
             )
-            items = (payload.get('data') or {}).get('feedbacks') or []
+            items = self._page_items(payload)
 
             if not items:
                 logger.info('No more feedbacks found (skip=%s, taken=%s)', skip, taken)
@@ -109,7 +251,11 @@ class WBClient(IReviewApi):
 
             logger.info('Fetched %s feedbacks (skip=%s, taken=%s)', len(items), skip, taken)
 
-            yield from items
+            try:
+                yield items
+            except GeneratorExit:
+                logger.info('Paging stopped by consumer (skip=%s, taken=%s)', skip, taken)
+                raise
 
             count = len(items)
             taken += count
@@ -138,7 +284,8 @@ class WBClient(IReviewApi):
 
         logger.info('Replying to feedback %s with text=%s', feedback_id, text[:100])
 
-        self.transport.post(
+        self._call(
+            self.transport.post,
             url=url,
             headers=self._headers(),
             json=payload,
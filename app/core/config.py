@@ -28,6 +28,12 @@ class APIKeys(BaseModel):
     gemini_token: str
 
 
+class GeminiQuotaSettings(BaseModel):
+    # per model, client-side; None = unlimited
+    rpm: int | None = 15
+    tpm: int | None = 1_000_000
+
+
 class DataBaseSettings(BaseModel):
     user: str
     password: str
@@ -53,6 +59,7 @@ class Settings(BaseSettings):
     )
     db: DataBaseSettings
     api_keys: APIKeys
+    gemini_quota: GeminiQuotaSettings = GeminiQuotaSettings()
     logging: LoggingSettings = LoggingSettings()
 
 
@@ -1,6 +1,19 @@
 from .base import Base
 from .db_helper import DataBaseHelper, db_helper
+from .fetch_cursor import FetchCursor
+from .lease import LeaseMixin, default_worker_id
+from .reply_cache_item import ReplyCacheItem
 from .response import Response
 from .review import Review
 
-__all__ = ('Base', 'DataBaseHelper', 'Response', 'Review', 'db_helper')
+__all__ = (
+    'Base',
+    'DataBaseHelper',
+    'FetchCursor',
+    'LeaseMixin',
+    'ReplyCacheItem',
+    'Response',
+    'Review',
+    'db_helper',
+    'default_worker_id',
+)
@@ -1,12 +1,28 @@
-from collections.abc import Iterator
+import hashlib
+import queue
+import threading
+from collections.abc import Callable, Iterator
 from contextlib import contextmanager
 
-from sqlalchemy import Engine, create_engine
+from sqlalchemy import Engine, create_engine, event, text
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
 
 
+class Listener:
+    """
+    Notifications of one channel: wait() blocks until one arrives or the timeout
+    runs out and returns the payloads received (empty list on timeout).
+    """
+
+    def __init__(self, wait: Callable[[float], list[str]]) -> None:
+        self._wait = wait
+
+    def wait(self, timeout: float) -> list[str]:
+        return self._wait(timeout)
+
+
 class DataBaseHelper:
     def __init__(
         self,
@@ -22,6 +38,9 @@ class DataBaseHelper:
             autoflush=False,
             autocommit=False,
         )
+        # in-process channels for databases without LISTEN/NOTIFY
+        self._local_listeners: dict[str, set[queue.SimpleQueue[str]]] = {}
+        self._local_lock = threading.Lock()
 
     @contextmanager
     def get_session(self) -> Iterator[Session]:
@@ -38,6 +57,98 @@ class DataBaseHelper:
                 session.rollback()
                 raise
 
+    @contextmanager
+    def advisory_lock(self, name: str) -> Iterator[bool]:
+        """
+        Postgres session-level advisory lock held for the block on its own pooled
+        connection; yields False right away if another session holds it. The lock
+        goes away with the connection, so a crashed holder does not block others.
+        Other databases have no advisory locks: always yields True.
+        """
+        if self.engine.dialect.name != 'postgresql':
+            yield True
+            return
+        digest = hashlib.blake2b(name.encode(), digest_size=8).digest()
+        key = int.from_bytes(digest, 'big', signed=True)
+        with self.engine.connect() as conn:
+            acquired = bool(
+                conn.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': key}).scalar()
+            )
+            conn.commit()  # the lock outlives the transaction, the connection is not idle in it
+            try:
+                yield acquired
+            finally:
+                if acquired:
+                    conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': key})
+                    conn.commit()
+
+    def _is_postgres(self) -> bool:
+        return self.engine.dialect.name == 'postgresql'
+
+    def notify(self, session: Session, channel: str, payload: str = '') -> None:
+        """
+        Wake up the listeners of `channel` once the session's transaction commits
+        (NOTIFY is transactional: nothing is sent on rollback). Without Postgres only
+        listeners of this process are woken up.
+        """
+        if self._is_postgres():
+            session.execute(
+                text('SELECT pg_notify(:channel, :payload)'),
+                {'channel': channel, 'payload': payload},
+            )
+            return
+
+        def deliver(_: Session) -> None:
+            with self._local_lock:
+                for inbox in self._local_listeners.get(channel, ()):
+                    inbox.put(payload)
+
+        event.listen(session, 'after_commit', deliver, once=True)
+
+    @contextmanager
+    def listen(self, channel: str) -> Iterator[Listener]:
+        """
+        LISTEN on `channel` for the block, on a dedicated autocommit psycopg connection
+        (a pooled one would lose notifications between checkouts).
+        """
+        if not self._is_postgres():
+            inbox: queue.SimpleQueue[str] = queue.SimpleQueue()
+            with self._local_lock:
+                self._local_listeners.setdefault(channel, set()).add(inbox)
+
+            def wait_local(timeout: float) -> list[str]:
+                try:
+                    payloads = [inbox.get(timeout=timeout)]
+                except queue.Empty:
+                    return []
+                while not inbox.empty():
+                    payloads.append(inbox.get_nowait())
+                return payloads
+
+            try:
+                yield Listener(wait_local)
+            finally:
+                with self._local_lock:
+                    self._local_listeners[channel].discard(inbox)
+            return
+
+        import psycopg
+        from psycopg import sql
+
+        conninfo = self.engine.url.set(drivername='postgresql').render_as_string(
+            hide_password=False
+        )
+        with psycopg.connect(conninfo, autocommit=True) as conn:
+            conn.execute(sql.SQL('LISTEN {}').format(sql.Identifier(channel)))
+
+            def wait_pg(timeout: float) -> list[str]:
+                payloads = [n.payload for n in conn.notifies(timeout=timeout, stop_after=1)]
+                if payloads:  # take whatever else is already queued
+                    payloads += [n.payload for n in conn.notifies(timeout=0.01)]
+                return payloads
+
+            yield Listener(wait_pg)
+
     def dispose(self):
         self.engine.dispose()
 
@@ -0,0 +1,32 @@
+import datetime
+
+from sqlalchemy import DateTime, Integer, String, UniqueConstraint, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class FetchCursor(Base):
+    __table_args__ = (UniqueConstraint('seller', 'scope'),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seller: Mapped[str] = mapped_column(String(64), nullable=False)
+    scope: Mapped[str] = mapped_column(
+        String(32), nullable=False, doc='all — весь каталог, nm:<id> — один артикул'
+    )
+    last_created_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        doc='createdDate самого свежего полученного отзыва',
+    )
+    reconciled_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        doc='время последнего полного прохода по окну',
+    )
+    updated_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        onupdate=func.now(),
+    )
@@ -0,0 +1,101 @@
+import datetime
+import os
+import socket
+import threading
+import uuid
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import DateTime, Row, Select, String, or_, update
+from sqlalchemy.orm import Mapped, Session, mapped_column
+
+# SQLite has no row locks: claims from threads of one process take turns here,
+# claims from other processes wait for the database write lock.
+_sqlite_claim_lock = threading.Lock()
+
+
+def default_worker_id() -> str:
+    """host:pid:random, unique per service instance."""
+    return f'{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+
+
+class LeaseMixin:
+    """
+    Work claiming across processes: a row is taken by one worker (claimed_by)
+    until lease_until; a lease that expired (the worker died) can be claimed again.
+    """
+
+    claimed_by: Mapped[str | None] = mapped_column(
+        String(64),
+        nullable=True,
+        doc='воркер, который взял строку в работу',
+    )
+    lease_until: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        doc='до этого времени строка занята claimed_by; после — свободна',
+    )
+
+    @classmethod
+    def lease_available(cls, now: datetime.datetime) -> Any:
+        return or_(cls.lease_until.is_(None), cls.lease_until <= now)
+
+    @classmethod
+    def claim(
+        cls,
+        session: Session,
+        candidates: Select[Any],
+        *,
+        owner: str,
+        lease: datetime.timedelta,
+        returning: Sequence[Any] = (),
+        **values: Any,
+    ) -> Sequence[Row[Any]]:
+        """
+        Lease the rows picked by `candidates` (a select of cls.id) to `owner`.
+        One UPDATE ... WHERE id IN (SELECT ... FOR UPDATE SKIP LOCKED) RETURNING:
+        rows locked by a concurrent claim are skipped, not waited for, and rows
+        leased to a live worker are filtered out. `values` are set on claimed rows
+        as well (e.g. a status). Returns (id, *returning) of the claimed rows.
+        """
+        now = datetime.datetime.now(datetime.UTC)
+        picked = (
+            candidates.where(cls.lease_available(now))
+            .with_for_update(of=cls, skip_locked=True)
+            .correlate(None)
+        )
+        stmt = (
+            update(cls)
+            .where(cls.id.in_(picked))  # type: ignore[attr-defined]
+            .values(claimed_by=owner, lease_until=now + lease, **values)
+            .returning(cls.id, *returning)  # type: ignore[attr-defined]
+        )
+        if session.get_bind().dialect.name != 'sqlite':
+            return session.execute(stmt).all()
+        with _sqlite_claim_lock:
+            return session.execute(stmt).all()
+
+    @classmethod
+    def renew(
+        cls, session: Session, owner: str, *criteria: Any, lease: datetime.timedelta
+    ) -> set[int]:
+        """
+        Extend the leases `owner` still holds (optionally narrowed by `criteria`).
+        Returns the ids still held: a row claimed by another worker meanwhile is not.
+        """
+        rows = session.execute(
+            update(cls)
+            .where(cls.claimed_by == owner, *criteria)
+            .values(lease_until=datetime.datetime.now(datetime.UTC) + lease)
+            .returning(cls.id)  # type: ignore[attr-defined]
+        )
+        return set(rows.scalars())
+
+    @classmethod
+    def release(cls, session: Session, owner: str, *criteria: Any, **values: Any) -> int:
+        """Drop the leases `owner` still holds (optionally narrowed by `criteria`)."""
+        return session.execute(
+            update(cls)
+            .where(cls.claimed_by == owner, *criteria)
+            .values(claimed_by=None, lease_until=None, **values)
+        ).rowcount
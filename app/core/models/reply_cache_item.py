@@ -0,0 +1,30 @@
+import datetime
+
+from sqlalchemy import DateTime, Integer, String, Text, func
+from sqlalchemy.orm import Mapped, mapped_column
+
+from .base import Base
+
+
+class ReplyCacheItem(Base):
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    key: Mapped[str] = mapped_column(
+        String(64),
+        nullable=False,
+        index=True,
+        doc='sha256 от модели, оценки и нормализованного текста отзыва',
+    )
+    model: Mapped[str] = mapped_column(String(64), nullable=False)
+    rating: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    reply_text: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+        index=True,
+    )
+    last_used_at: Mapped[datetime.datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        server_default=func.now(),
+    )
@@ -1,7 +1,7 @@
 import datetime
 from typing import TYPE_CHECKING
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String, Text, func
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.orm import (
     Mapped,
     mapped_column,
@@ -9,12 +9,18 @@ from sqlalchemy.orm import (
 )
 
 from .base import Base
+from .lease import LeaseMixin
 
 if TYPE_CHECKING:
     from .review import Review
 
 
-class Response(Base):
+class Response(LeaseMixin, Base):
+    __table_args__ = (
+        # publisher: drafts that are due for a (re)try
+        Index('ix_responses_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
     id: Mapped[int] = mapped_column(
         Integer,
         primary_key=True,
@@ -33,10 +39,15 @@ class Response(Base):
         nullable=False,
         default='gemini-1.5-flash',
     )
+    prompt_version: Mapped[str | None] = mapped_column(
+        String(16),
+        nullable=True,
+        doc='версия шаблона промпта; NULL — ответ без LLM (шаблон, кэш)',
+    )
     status: Mapped[str] = mapped_column(
         String(16),
         nullable=False,
-        default='draft',  # draft->published->failed
+        default='draft',  # draft->sending->published | sending->draft (retry) | sending->failed
         index=True,
     )
     created_at: Mapped[datetime.datetime] = mapped_column(
@@ -48,6 +59,19 @@ class Response(Base):
         DateTime(timezone=True),
         nullable=True,
     )
+    attempt_count: Mapped[int] = mapped_column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default='0',
+        doc='неудачные попытки публикации',
+    )
+    next_attempt_at: Mapped[datetime.datetime | None] = mapped_column(
+        DateTime(timezone=True),
+        nullable=True,
+        doc='не публиковать раньше этого времени; NULL — сразу',
+    )
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
 
     review: Mapped['Review'] = relationship(
         back_populates='response',
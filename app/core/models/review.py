@@ -9,12 +9,13 @@ from sqlalchemy.orm import (
 )
 
 from .base import Base
+from .lease import LeaseMixin
 
 if TYPE_CHECKING:
     from .response import Response
 
 
-class Review(Base):
+class Review(LeaseMixin, Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     wb_id: Mapped[str] = mapped_column(String(128), unique=True, nullable=False, index=True)
     user_name: Mapped[str | None] = mapped_column(
@@ -1,6 +1,145 @@
-from .services import ReviewsPipeline
+import argparse
+import datetime
+import signal
+import threading
+from collections.abc import Sequence
+from types import FrameType
 
-if __name__ == '__main__':
-    pipeline = ReviewsPipeline()
-    result = pipeline.run()
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+
+from .core.logger import logger
+from .core.models import db_helper
+from .services import (
+    GenerateRepliesService,
+    PublishRepliesService,
+    ReviewsPipeline,
+    StageWorker,
+)
+from .services.worker import NEW_DRAFTS_CHANNEL, NEW_REVIEWS_CHANNEL
+
+PIPELINE_LOCK = 'ai-replies:reviews-pipeline'
+
+
+def run_cycle(pipeline: ReviewsPipeline) -> dict[str, int | float] | None:
+    """
+    One pipeline pass under the advisory lock: a cycle that overlaps a previous one
+    or another replica is skipped, so no stage ever runs twice at the same time.
+    """
+    if pipeline.stop_event.is_set():
+        return None
+    with db_helper.advisory_lock(PIPELINE_LOCK) as acquired:
+        if not acquired:
+            logger.info('Another pipeline cycle holds the lock, skipping this one')
+            return None
+        return pipeline.run()
+
+
+def run_once(args: argparse.Namespace) -> None:
+    pipeline = ReviewsPipeline(streaming=args.streaming)
+    result = run_cycle(pipeline)
     print(f'Pipeline finished: {result}')
+
+
+def run_scheduler(args: argparse.Namespace) -> None:
+    """
+    Long-running daemon: the pipeline (WB / Gemini clients) and the DB pool are built
+    once and stay warm between cycles. Cycles start every --hours/--minutes plus up
+    to --jitter seconds; the first one right away. SIGINT / SIGTERM let the running
+    cycle finish the items in hand; the DB pool is disposed only after it returns.
+    """
+    pipeline = ReviewsPipeline(streaming=args.streaming)
+    cycle_running = threading.Lock()
+
+    def cycle(pipeline: ReviewsPipeline) -> None:
+        with cycle_running:
+            run_cycle(pipeline)
+
+    scheduler = BlockingScheduler(timezone=datetime.UTC)
+    scheduler.add_job(
+        cycle,
+        IntervalTrigger(hours=args.hours, minutes=args.minutes, jitter=args.jitter),
+        args=(pipeline,),
+        id='reviews-pipeline',
+        max_instances=1,
+        coalesce=True,
+        next_run_time=datetime.datetime.now(datetime.UTC),
+    )
+
+    def shutdown(signum: int, _: FrameType | None) -> None:
+        logger.info('Got %s, stopping after the current items', signal.Signals(signum).name)
+        pipeline.stop()
+        scheduler.shutdown(wait=False)
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    logger.info(
+        'Scheduler started: every %sh %smin, jitter up to %ss',
+        args.hours,
+        args.minutes,
+        args.jitter,
+    )
+    try:
+        scheduler.start()
+    finally:
+        # shutdown(wait=False) above does not wait for the job: join it here, so the
+        # cycle can write its last results back before the pool goes away
+        with cycle_running:
+            db_helper.dispose()
+
+
+def run_worker(args: argparse.Namespace) -> None:
+    """
+    One stage as its own process, woken up by NOTIFY from the stage before it
+    (fetcher -> generate -> publish) and polling every --poll seconds as a fallback.
+    """
+    if args.stage == 'generate':
+        worker = StageWorker(GenerateRepliesService(), NEW_REVIEWS_CHANNEL, poll_interval=args.poll)
+    else:
+        worker = StageWorker(PublishRepliesService(), NEW_DRAFTS_CHANNEL, poll_interval=args.poll)
+
+    def shutdown(signum: int, _: FrameType | None) -> None:
+        logger.info('Got %s, stopping after the current items', signal.Signals(signum).name)
+        worker.stop()
+
+    signal.signal(signal.SIGINT, shutdown)
+    signal.signal(signal.SIGTERM, shutdown)
+    try:
+        worker.run()
+    finally:
+        db_helper.dispose()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m app.main', description='WB reviews replies')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    once = commands.add_parser('run-once', help='run the pipeline once')
+    once.set_defaults(handler=run_once)
+
+    daemon = commands.add_parser('run-scheduler', help='run the pipeline on an interval')
+    daemon.add_argument('--hours', type=float, default=3, help='interval between cycles')
+    daemon.add_argument('--minutes', type=float, default=0, help='added to --hours')
+    daemon.add_argument('--jitter', type=int, default=0, help='random delay, seconds')
+    daemon.set_defaults(handler=run_scheduler)
+
+    worker = commands.add_parser('run-worker', help='run one stage, woken up by NOTIFY')
+    worker.add_argument('stage', choices=('generate', 'publish'))
+    worker.add_argument('--poll', type=float, default=60, help='fallback polling, seconds')
+    worker.set_defaults(handler=run_worker)
+
+    for command in (once, daemon):
+        command.add_argument(
+            '--streaming', action='store_true', help='overlap fetch, generate and publish'
+        )
+    return parser
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    args = build_parser().parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
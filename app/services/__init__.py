@@ -2,10 +2,12 @@ from .fetcher import FetchNewReviewsService
 from .pipeline import ReviewsPipeline
 from .publisher import PublishRepliesService
 from .replier import GenerateRepliesService
+from .worker import StageWorker
 
 __all__ = (
     'FetchNewReviewsService',
     'GenerateRepliesService',
     'PublishRepliesService',
     'ReviewsPipeline',
+    'StageWorker',
 )
@@ -1,26 +1,70 @@
 from __future__ import annotations
 
 import datetime
+import math
+import threading
+from collections.abc import Callable
+from contextlib import closing, nullcontext
+from dataclasses import dataclass
 
-from sqlalchemy import select
+from sqlalchemy import Insert, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
 
 from app.clients import WBClient
 from app.core.logger import logger
 from app.core.models import (
+    FetchCursor,
     Review,
     db_helper,
 )
 
+from .worker import NEW_REVIEWS_CHANNEL
+
+
+@dataclass
+class FetchStats:
+    created: int = 0
+    pages: int = 0
+    commits: int = 0
+    stopped_early: bool = False
+    interrupted: bool = False  # stop() was requested mid-paging
+    pages_saved: int = 0  # upper bound: pages left within max_total when paging stopped
+
 
 class FetchNewReviewsService:
     """
     - Use-case: take UNanswered reviews from WB by window and save to DB.
-    - ACID: one transaction for the whole batch (session_scope) — all or nothing.
-    - Idempotency: check duplicates by wb_id.
+    - ACID: one transaction for the whole batch (session_scope) — all or nothing,
+      or, with commit_every=N, durable chunks of ~N new reviews without holding
+      a session open while WB is paged.
+    - Idempotency: check duplicates by wb_id, one `wb_id IN (...)` lookup per WB page;
+      INSERT ... ON CONFLICT (wb_id) DO NOTHING relies on the unique constraint.
+    - New reviews are written with one bulk INSERT per page / chunk.
+    - Incremental: dateFrom starts at the persisted cursor (newest createdDate minus overlap);
+      the full window is rescanned (reconcile) once per reconcile_interval.
+    - Early stop (dateDesc only): paging ends after a streak of already known wb_ids
+      or a fully known page; the next page is never requested.
     """
 
-    def __init__(self, wb_client: WBClient | None = None) -> None:
+    def __init__(
+        self,
+        wb_client: WBClient | None = None,
+        *,
+        seller: str = 'default',
+        overlap: datetime.timedelta = datetime.timedelta(minutes=30),
+        reconcile_interval: datetime.timedelta = datetime.timedelta(hours=24),
+    ) -> None:
         self.wb_client = wb_client or WBClient.create()
+        self.seller = seller
+        self.overlap = overlap
+        self.reconcile_interval = reconcile_interval
+        self.last_stats: FetchStats | None = None
+        self.stop_event = threading.Event()
+
+    def stop(self) -> None:
+        """Stop paging after the current page (graceful shutdown)."""
+        self.stop_event.set()
 
     @staticmethod
     def _to_unix(dt: datetime.datetime) -> int:
@@ -35,6 +79,29 @@ class FetchNewReviewsService:
             return datetime.datetime.now(datetime.UTC)
         return datetime.datetime.fromisoformat(s).astimezone(datetime.UTC)
 
+    @staticmethod
+    def _as_utc(dt: datetime.datetime) -> datetime.datetime:
+        # SQLite returns naive datetimes even for DateTime(timezone=True)
+        if dt.tzinfo is None:
+            return dt.replace(tzinfo=datetime.UTC)
+        return dt.astimezone(datetime.UTC)
+
+    def _cursor_scope(self, nm_id: int | None) -> str:
+        return f'nm:{nm_id}' if nm_id is not None else 'all'
+
+    def _get_cursor(self, session: Session, nm_id: int | None) -> FetchCursor:
+        scope = self._cursor_scope(nm_id)
+        cursor = session.execute(
+            select(FetchCursor).where(
+                FetchCursor.seller == self.seller,
+                FetchCursor.scope == scope,
+            )
+        ).scalar_one_or_none()
+        if cursor is None:
+            cursor = FetchCursor(seller=self.seller, scope=scope)
+            session.add(cursor)
+        return cursor
+
     def execute(
         self,
         *,
@@ -43,23 +110,76 @@ class FetchNewReviewsService:
         max_total: int = 10000,
         order: str = 'dateDesc',
         nm_id: int | None = None,
+        reconcile: bool | None = None,
+        stop_after_known: int | None = None,
+        stop_on_known_page: bool = False,
+        commit_every: int | None = None,
+        prefetch: int = 0,
+        on_commit: Callable[[list[str]], None] | None = None,
     ) -> int:
+        """
+        reconcile=None — decide by the cursor: full window scan when it was never done
+        or is older than reconcile_interval, otherwise incremental from the cursor.
+        reconcile=True/False — force the mode.
+        stop_after_known / stop_on_known_page — stop paging on N consecutive known
+        wb_ids / on a page without new reviews. Applied only for order='dateDesc'.
+        commit_every=None — one transaction for the whole run.
+        commit_every=N — commit as soon as N new reviews are buffered (1 = every page).
+        prefetch=N — fetch up to N pages ahead while the current one is stored;
+        with early stop, pages already prefetched are requested anyway.
+        on_commit — called with the wb_ids of every committed chunk (chunked mode only);
+        while it blocks, WB paging waits too.
+        """
+        if on_commit is not None and commit_every is None:
+            raise ValueError('on_commit requires commit_every')
+        early_stop = order == 'dateDesc' and (bool(stop_after_known) or stop_on_known_page)
+        stats = FetchStats()
+        self.last_stats = stats
         now = datetime.datetime.now(datetime.UTC)
-        date_from = self._to_unix(now - datetime.timedelta(days=window_days))
+        window_from = now - datetime.timedelta(days=window_days)
+
+        with db_helper.get_session() as session:
+            cursor = self._get_cursor(session, nm_id)
+            last_created_at = (
+                self._as_utc(cursor.last_created_at) if cursor.last_created_at else None
+            )
+            reconciled_at = self._as_utc(cursor.reconciled_at) if cursor.reconciled_at else None
+
+        if reconcile is None:
+            reconcile = (
+                last_created_at is None
+                or reconciled_at is None
+                or reconciled_at + self.reconcile_interval <= now
+            )
+
+        start = window_from
+        if not reconcile and last_created_at is not None:
+            start = max(window_from, last_created_at - self.overlap)
+
+        date_from = self._to_unix(start)
         date_to = self._to_unix(now)
 
         logger.info(
-            'Fetching WB reviews: window=%sdays, from=%s to=%s, page_size=%s, max_total=%s',
+            'Fetching WB reviews (%s): window=%sdays, from=%s to=%s, page_size=%s, '
+            'max_total=%s, commit_every=%s',
+            'reconcile' if reconcile else 'incremental',
             window_days,
             datetime.datetime.fromtimestamp(date_from, tz=datetime.UTC),
             datetime.datetime.fromtimestamp(date_to, tz=datetime.UTC),
             page_size,
             max_total,
+            commit_every,
         )
 
-        created = 0
-        with db_helper.session_scope() as session:
-            for item in self.wb_client.list_feedbacks(
+        taken = 0
+        streak = 0
+        newest = last_created_at
+        # chunked mode: new rows wait here (bounded by commit_every + page_size)
+        pending: dict[str, dict] = {}
+        shared = db_helper.session_scope() if commit_every is None else nullcontext(None)
+
+        with shared as shared_session:
+            pages = self.wb_client.list_feedback_pages(
                 is_answered=False,
                 date_from=date_from,
                 date_to=date_to,
@@ -67,36 +187,172 @@ class FetchNewReviewsService:
                 page_size=page_size,
                 max_total=max_total,
                 nm_id=nm_id,
-            ):
-                wb_id = str(item.get('id') or '').strip()
-                if not wb_id:
-                    logger.warning('Skipping feedback without id: %s', item)
-                    continue
-
-                exists = session.execute(
-                    select(Review.id).where(Review.wb_id == wb_id)
-                ).scalar_one_or_none()
-                if exists:
-                    logger.debug('Feedback %s already exists, skipping', wb_id)
-                    continue
-
-                # sku -> productDetails.nmId
-                pd = item.get('productDetails') or {}
-                nm = pd.get('nmId')
-                sku = str(nm) if nm is not None else None
-
-                review = Review(
-                    wb_id=wb_id,
-                    user_name=item.get('userName'),
-                    text=item.get('text'),
-                    rating=item.get('productValuation'),
-                    sku=sku,
-                    created_at=self._parse_wb_iso(item.get('createdDate')),
-                    status='new',
-                )
-                session.add(review)
-                created += 1
-                logger.info('Inserted new review wb_id=%s, rating=%s', wb_id, review.rating)
-
-        logger.info('Total inserted reviews: %s', created)
-        return created
+                prefetch=prefetch,
+            )
+            try:
+                with closing(pages):
+                    for page in pages:
+                        if self.stop_event.is_set():
+                            stats.interrupted = True
+                            logger.info('Stop requested, WB paging interrupted')
+                            break
+                        stats.pages += 1
+                        taken += len(page)
+                        for item in page:
+                            if item.get('createdDate'):
+                                created_at = self._parse_wb_iso(item['createdDate'])
+                                newest = created_at if newest is None else max(newest, created_at)
+
+                        if shared_session is not None:
+                            page_created, known = self._store_page(shared_session, page)
+                            stats.created += page_created
+                        else:
+                            with db_helper.get_session() as session:
+                                _, known = self._store_page(session, page, pending)
+                            if commit_every is not None and len(pending) >= commit_every:
+                                self._flush(pending, stats, on_commit)
+
+                        if not early_stop:
+                            continue
+                        stop = stop_on_known_page and bool(known) and all(known)
+                        for is_known in known:
+                            streak = streak + 1 if is_known else 0
+                            stop = stop or bool(stop_after_known and streak >= stop_after_known)
+                        if stop:
+                            stats.stopped_early = True
+                            stats.pages_saved = math.ceil((max_total - taken) / page_size)
+                            logger.info(
+                                'Stopping WB paging after page %s: known feedbacks reached, '
+                                'up to %s pages saved',
+                                stats.pages,
+                                stats.pages_saved,
+                            )
+                            break
+            finally:
+                # chunked mode keeps what was already fetched even if paging fails
+                if pending:
+                    self._flush(pending, stats, on_commit)
+
+        if taken >= max_total:
+            # WB may still have older reviews past max_total: keep the cursor
+            logger.warning('Reached max_total=%s, fetch cursor is not advanced', max_total)
+        elif stats.interrupted:
+            logger.warning('Paging was interrupted, fetch cursor is not advanced')
+        else:
+            with db_helper.session_scope() as session:
+                cursor = self._get_cursor(session, nm_id)
+                cursor.last_created_at = newest
+                if reconcile:
+                    cursor.reconciled_at = now
+
+        logger.info('Total inserted reviews: %s (%s)', stats.created, stats)
+        return stats.created
+
+    def _to_row(self, item: dict) -> dict | None:
+        wb_id = str(item.get('id') or '').strip()
+        if not wb_id:
+            logger.warning('Skipping feedback without id: %s', item)
+            return None
+
+        # sku -> productDetails.nmId
+        pd = item.get('productDetails') or {}
+        nm = pd.get('nmId')
+        sku = str(nm) if nm is not None else None
+
+        return {
+            'wb_id': wb_id,
+            'user_name': item.get('userName'),
+            'text': item.get('text'),
+            'rating': item.get('productValuation'),
+            'sku': sku,
+            'created_at': self._parse_wb_iso(item.get('createdDate')),
+            'status': 'new',
+        }
+
+    def _store_page(
+        self,
+        session: Session,
+        items: list[dict],
+        pending: dict[str, dict] | None = None,
+    ) -> tuple[int, list[bool]]:
+        """
+        Deduplicate one WB page against the DB with a single IN lookup.
+        New reviews are inserted with one bulk statement, or, when `pending`
+        is given, buffered there for the next chunk commit.
+        Returns the number of inserted reviews and, in page order,
+        whether each feedback was already known.
+        """
+        rows: dict[str, dict] = {}
+        wb_ids: list[str] = []
+        for item in items:
+            row = self._to_row(item)
+            if row is not None:
+                wb_ids.append(row['wb_id'])
+                rows.setdefault(row['wb_id'], row)
+        if not rows:
+            return 0, []
+
+        existing = set(
+            session.execute(select(Review.wb_id).where(Review.wb_id.in_(rows))).scalars()
+        )
+        if existing:
+            logger.debug('%s feedbacks of the page already exist, skipping', len(existing))
+        if pending:
+            existing |= rows.keys() & pending.keys()
+
+        seen: set[str] = set()
+        known: list[bool] = []
+        for wb_id in wb_ids:
+            known.append(wb_id in existing or wb_id in seen)
+            seen.add(wb_id)
+
+        new_rows = [row for wb_id, row in rows.items() if wb_id not in existing]
+        if not new_rows:
+            return 0, known
+
+        if pending is not None:
+            pending.update((row['wb_id'], row) for row in new_rows)
+            return 0, known
+        return len(self._insert_rows(session, new_rows)), known
+
+    def _flush(
+        self,
+        pending: dict[str, dict],
+        stats: FetchStats,
+        on_commit: Callable[[list[str]], None] | None = None,
+    ) -> None:
+        """Commit buffered reviews in their own short transaction."""
+        rows = list(pending.values())
+        pending.clear()
+        with db_helper.session_scope() as session:
+            inserted = self._insert_rows(session, rows)
+        stats.created += len(inserted)
+        stats.commits += 1
+        logger.debug('Committed chunk of %s reviews', len(rows))
+        if on_commit is not None and inserted:
+            on_commit(inserted)
+
+    @staticmethod
+    def _insert_rows(session: Session, rows: list[dict]) -> list[str]:
+        """
+        Bulk INSERT ... ON CONFLICT (wb_id) DO NOTHING RETURNING wb_id:
+        rows inserted meanwhile by another run are skipped, not failed.
+        Returns the wb_ids actually inserted; the replier is notified on commit.
+        """
+        dialect = session.get_bind().dialect.name
+        stmt: Insert
+        if dialect == 'postgresql':
+            stmt = postgresql.insert(Review).on_conflict_do_nothing(index_elements=['wb_id'])
+        elif dialect == 'sqlite':
+            stmt = sqlite.insert(Review).on_conflict_do_nothing(index_elements=['wb_id'])
+        else:
+            stmt = insert(Review)
+
+        inserted = list(session.execute(stmt.returning(Review.wb_id), rows).scalars())
+        if inserted:
+            db_helper.notify(session, NEW_REVIEWS_CHANNEL, str(len(inserted)))
+        inserted_ids = set(inserted)
+        for row in rows:
+            if row['wb_id'] in inserted_ids:
+                logger.info('Inserted new review wb_id=%s, rating=%s', row['wb_id'], row['rating'])
+        return inserted
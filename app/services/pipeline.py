@@ -1,9 +1,62 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections.abc import Callable, Generator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+from app.clients import QuotaScheduler, WBClient
 from app.core.logger import logger
 
 from .fetcher import FetchNewReviewsService
 from .publisher import PublishRepliesService
 from .replier import GenerateRepliesService
 
+_CLOSED = object()
+
+
+class _Channel[T]:
+    """
+    Bounded queue between two streaming stages.
+    - put() blocks while the queue is full: backpressure up to WB paging.
+    - Iterating yields batches until close(); an empty batch every `idle` seconds
+      without input, so the consumer can flush what it holds.
+    - Once `stopped()` (a stage failed or stop was requested) both ends give up instead
+      of waiting; dropped batches stay in the database for the next run.
+    """
+
+    def __init__(self, maxsize: int, stopped: Callable[[], bool], idle: float) -> None:
+        self._queue: queue.Queue[list[T] | object] = queue.Queue(maxsize=max(1, maxsize))
+        self._stopped = stopped
+        self._idle = idle
+
+    def _put(self, item: list[T] | object) -> None:
+        while not self._stopped():
+            try:
+                self._queue.put(item, timeout=self._idle)
+                return
+            except queue.Full:
+                continue
+
+    def put(self, batch: list[T]) -> None:
+        if batch:
+            self._put(list(batch))
+
+    def close(self) -> None:
+        self._put(_CLOSED)
+
+    def __iter__(self) -> Generator[list[T]]:
+        while not self._stopped():
+            try:
+                item = self._queue.get(timeout=self._idle)
+            except queue.Empty:
+                yield []
+                continue
+            if item is _CLOSED:
+                return
+            yield item  # type: ignore[misc]
+
 
 class ReviewsPipeline:
     """
@@ -11,30 +64,129 @@ class ReviewsPipeline:
     1. Get fresh reviews from WB
     2. Generate responses
     3. Publish responses
+    Sequential mode runs the stages one after another. Streaming mode runs them at once,
+    linked by bounded queues (queue_size batches): reviews committed by the fetcher go
+    to the replier, committed drafts go to the publisher. Each stage keeps its own
+    concurrency (fetch_prefetch pages, replier_concurrency / publisher_workers threads);
+    a full queue blocks the stage before it, down to WB paging. The replier and the
+    publisher first drain the work left by earlier runs, then follow the queues.
     """
 
-    def __init__(self) -> None:
-        self.fetcher = FetchNewReviewsService()
-        self.publisher = PublishRepliesService()
-        self.replier = GenerateRepliesService()
+    def __init__(
+        self,
+        *,
+        streaming: bool = False,
+        queue_size: int = 8,
+        fetch_prefetch: int = 1,
+        replier_concurrency: int = 4,
+        publisher_workers: int = 4,
+        idle_flush_sec: float = 0.5,
+    ) -> None:
+        # one client, so fetching and publishing share WB's rate limit
+        wb_client = WBClient.create()
+        self.fetcher = FetchNewReviewsService(wb_client)
+        self.publisher = PublishRepliesService(wb_client, workers=publisher_workers)
+        # Gemini RPM/TPM from settings, throttled before the API answers 429
+        self.quota = QuotaScheduler.from_settings()
+        self.replier = GenerateRepliesService(concurrency=replier_concurrency, quota=self.quota)
+        self.streaming = streaming
+        self.queue_size = queue_size
+        self.fetch_prefetch = fetch_prefetch
+        self.idle_flush_sec = idle_flush_sec
+        self.stop_event = threading.Event()
+
+    def stop(self) -> None:
+        """
+        Graceful shutdown, safe to call from a signal handler: every stage finishes
+        the item in hand and takes no new ones; a cycle not started yet does not run.
+        """
+        self.stop_event.set()
+        self.fetcher.stop()
+        self.replier.stop()
+        self.publisher.stop()
 
-    def run(self) -> dict[str, int]:
-        logger.info('🚀 Starting reviews pipeline')
+    @staticmethod
+    def _timed(fn: Callable[[], int]) -> tuple[int, float]:
+        started = time.monotonic()
+        result = fn()
+        return result, round(time.monotonic() - started, 3)
 
-        created_reviews = self.fetcher.execute()
-        logger.info('Step 1 finished: fetched %s new reviews', created_reviews)
+    @staticmethod
+    def _summary(stages: Sequence[tuple[int, float]]) -> dict[str, int | float]:
+        (fetched, fetch_sec), (drafted, generate_sec), (published, publish_sec) = stages
+        return {
+            'fetched_reviews': fetched,
+            'drafted_responses': drafted,
+            'published_responses': published,
+            'fetch_sec': fetch_sec,
+            'generate_sec': generate_sec,
+            'publish_sec': publish_sec,
+        }
 
-        drafted_responses = self.replier.execute()
-        logger.info('Step 2 finished: drafted %s responses', drafted_responses)
+    def _run_sequential(self) -> dict[str, int | float]:
+        fetch = self._timed(self.fetcher.execute)
+        logger.info('Step 1 finished: fetched %s new reviews', fetch[0])
 
-        published_responses = self.publisher.execute()
-        logger.info('Step 3 finished: published %s responses', published_responses)
+        generate = self._timed(self.replier.execute)
+        logger.info('Step 2 finished: drafted %s responses', generate[0])
 
-        summary = {
-            'fetched_reviews': created_reviews,
-            'drafted_responses': drafted_responses,
-            'published_responses': published_responses,
-        }
+        publish = self._timed(self.publisher.execute)
+        logger.info('Step 3 finished: published %s responses', publish[0])
+
+        return self._summary((fetch, generate, publish))
+
+    def _run_streaming(self) -> dict[str, int | float]:
+        failed = threading.Event()
+
+        def stopped() -> bool:
+            return failed.is_set() or self.stop_event.is_set()
+
+        fetched: _Channel[str] = _Channel(self.queue_size, stopped, self.idle_flush_sec)
+        drafted: _Channel[int] = _Channel(self.queue_size, stopped, self.idle_flush_sec)
+
+        def stage(fn: Callable[[], int], out: _Channel | None) -> tuple[int, float]:
+            try:
+                return self._timed(fn)
+            except Exception:
+                failed.set()
+                raise
+            finally:
+                if out is not None:
+                    out.close()
+
+        def fetch() -> int:
+            return self.fetcher.execute(
+                commit_every=1, prefetch=self.fetch_prefetch, on_commit=fetched.put
+            )
+
+        def generate() -> int:
+            return self.replier.execute(batches=fetched, on_commit=drafted.put)
+
+        def publish() -> int:
+            return self.publisher.execute(batches=drafted)
+
+        stages: tuple[tuple[Callable[[], int], _Channel | None], ...] = (
+            (fetch, fetched),
+            (generate, drafted),
+            (publish, None),
+        )
+        with ThreadPoolExecutor(max_workers=len(stages), thread_name_prefix='pipeline') as pool:
+            jobs = [pool.submit(stage, fn, out) for fn, out in stages]
+            for job in jobs:
+                if (error := job.exception()) is not None:
+                    raise error
+        return self._summary([job.result() for job in jobs])
+
+    def run(self) -> dict[str, int | float]:
+        if self.stop_event.is_set():
+            raise RuntimeError('Pipeline is stopped')
+        logger.info(
+            '🚀 Starting reviews pipeline (%s)', 'streaming' if self.streaming else 'sequential'
+        )
+        started = time.monotonic()
+
+        summary = self._run_streaming() if self.streaming else self._run_sequential()
+        summary['total_sec'] = round(time.monotonic() - started, 3)
 
         logger.info('Pipeline finished: %s', summary)
         return summary
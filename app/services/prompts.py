@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass
+from typing import Protocol
+
+NO_TEXT = 'Покупатель оставил только оценку без текста.'
+
+
+class PromptReview(Protocol):
+    @property
+    def id(self) -> int: ...
+    @property
+    def text(self) -> str | None: ...
+    @property
+    def rating(self) -> int | None: ...
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    Versioned reply prompt. The static part (brand voice, tone per rating, output format)
+    is the system_instruction, sent once per cached context / as a separate field;
+    render() / render_batch() build only the review-specific payload.
+    """
+
+    version: str
+    system_instruction: str
+    batch_system_instruction: str
+
+    @staticmethod
+    def _text(text: str | None) -> str:
+        return (text or '').strip() or NO_TEXT
+
+    def render(self, text: str | None, rating: int | None) -> str:
+        return f'Оценка: {rating or 0}/5. Отзыв: "{self._text(text)}"'
+
+    def render_batch(self, reviews: Sequence[PromptReview]) -> str:
+        items = [{'id': r.id, 'rating': r.rating or 0, 'text': self._text(r.text)} for r in reviews]
+        return json.dumps(items, ensure_ascii=False)
+
+
+def _styles(styles: Mapping[str, str]) -> str:
+    return '\n'.join(f'- {ratings}: {style}' for ratings, style in styles.items())
+
+
+_STYLES_V1 = {
+    '5/5': 'Тепло поблагодари и пригласи вернуться.',
+    '4/5': 'Поблагодари и мягко спроси, что можно улучшить.',
+    '3/5 или без оценки': 'Нейтрально поблагодари и предложи помощь/уточнение.',
+    '2/5': 'Извинись, предложи помощь/обмен/возврат, попроси уточнить детали.',
+    '1/5': 'Искренне извинись, предложи оперативную помощь/возврат и способ связи.',
+}
+
+_VOICE_V1 = (
+    'Ты — поддержка бренда на Wildberries. Пиши очень кратко (2 - 4 предложения), '
+    'дружелюбно, без спама. Тон ответа зависит от оценки покупателя:\n' + _styles(_STYLES_V1) + '\n'
+)
+
+PROMPTS: dict[str, PromptTemplate] = {
+    'v1': PromptTemplate(
+        version='v1',
+        system_instruction=_VOICE_V1 + 'Сообщение содержит оценку и текст отзыва, ответь на него.',
+        batch_system_instruction=(
+            _VOICE_V1 + 'Сообщение содержит JSON-массив отзывов {"id", "rating", "text"}. '
+            'Ответь JSON-массивом объектов {"id": <id отзыва>, "reply": "<ответ>"}, '
+            'по одному на каждый отзыв.'
+        ),
+    ),
+}
+DEFAULT_PROMPT_VERSION = 'v1'
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
 import datetime
+import heapq
+import random
+import threading
 import time
-from collections.abc import Iterable
+from collections import deque
+from collections.abc import Generator, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
 
-from sqlalchemy import select
+from sqlalchemy import Select, case, or_, select, update
 
 from app.clients import WBClient
 from app.core.logger import logger
@@ -12,14 +19,44 @@ from app.core.models import (
     Response,
     Review,
     db_helper,
+    default_worker_id,
 )
 
 
+@dataclass(frozen=True)
+class Draft:
+    id: int
+    review_id: int
+    wb_id: str
+    reply_text: str
+
+
 class PublishRepliesService:
     """
     Use-case: publish responses to WB.
-    ACID: one transaction for EVERY response (so that WB and DB do not diverge).
-    Reliability: soft retry/backoff for temporary network/HTTP errors.
+    - Drafts are claimed one chunk of chunk_size at a time (keyset by Response.id) with
+      one UPDATE that moves them to 'sending' and leases them to this instance
+      (claimed_by / lease_until, SKIP LOCKED), then loaded together with their reviews
+      by one joined query; worker threads only talk to WB.
+    - Leases: the claim sets lease_until; the drafts in hand are re-leased every third
+      of sending_timeout, so a long chunk does not outlive its lease. A draft whose
+      lease went to another worker (it expired and was recovered) is skipped.
+    - Successful posts are written back in batches: one UPDATE ... WHERE id IN (...) for
+      responses and one for reviews, at most write_back_sec after the first post of the
+      batch or once write_batch_size posts are waiting. Well under one statement per
+      post, and a crash re-posts no more than write_back_sec worth of replies.
+    - Idempotency / crash safety: a response is posted only from 'sending', which only
+      one claim can set, and leaves it only for 'published', 'draft' (retry) or 'failed',
+      written by the lease holder. Several processes / nodes can publish from one
+      database. A response whose 'sending' lease expired (crash between the post and
+      the write-back) goes back to 'draft' on the next run, counted as an attempt.
+    - Concurrency: up to `workers` posts in parallel; the pace is set by the WB client's
+      shared TokenBucket, so any number of workers stays under the limit.
+    - Reliability: failed publishes are retried with exponential backoff and jitter.
+      The retry state lives on the response (attempt_count, next_attempt_at, last_error),
+      so it survives restarts; after max_retries retries the response becomes 'failed'
+      and is not picked up again. Retries due within retry_within_run seconds are
+      done in the same run, later ones are left to the next run.
     """
 
     def __init__(
@@ -27,89 +64,343 @@ class PublishRepliesService:
         wb_client: WBClient | None = None,
         *,
         max_retries: int = 3,
-        backoff_sec: float = 0.8,  # -> 0.8 1.6 2.4 ...
+        backoff_sec: float = 0.8,  # -> ~0.8 1.6 3.2 ... (with jitter)
+        max_backoff_sec: float = 3600.0,
+        retry_within_run: float = 30.0,
+        workers: int = 4,
+        chunk_size: int = 200,
+        sending_timeout: datetime.timedelta = datetime.timedelta(minutes=10),
+        write_back_sec: float = 1.0,
+        write_batch_size: int = 50,
+        worker_id: str | None = None,
     ) -> None:
         self.wb = wb_client or WBClient.create()
         self.max_retries = max_retries
         self.backoff_sec = backoff_sec
+        self.max_backoff_sec = max_backoff_sec
+        self.retry_within_run = retry_within_run
+        self.workers = max(1, workers)
+        self.chunk_size = max(1, chunk_size)
+        self.sending_timeout = sending_timeout
+        self.write_back_sec = write_back_sec
+        self.write_batch_size = max(1, write_batch_size)
+        self.worker_id = worker_id or default_worker_id()
+        self.stop_event = threading.Event()
+
+    def stop(self) -> None:
+        """
+        Graceful shutdown: finish the posts in flight, write them back and start
+        no more; claimed drafts not posted yet go back to 'draft'.
+        """
+        self.stop_event.set()
+
+    @staticmethod
+    def _now() -> datetime.datetime:
+        return datetime.datetime.now(datetime.UTC)
 
-    def _iter_draft_ids(self, limit: int | None = None) -> Iterable[int]:
+    def _recover_stale(self) -> int:
         """
-        Quickly get a list of IDs of all drafts (Response.status == "draft") -
-        without dragging entire objects and keeping a long transaction.
+        Return responses whose 'sending' lease expired (the run died mid-publish) to
+        'draft', counted as an attempt; past max_retries they become 'failed' instead,
+        so a reply that keeps killing the process is not re-posted forever.
         """
+        with db_helper.session_scope() as session:
+            statuses = (
+                session.execute(
+                    update(Response)
+                    .where(Response.status == 'sending', Response.lease_until <= self._now())
+                    .values(
+                        status=case(
+                            (Response.attempt_count + 1 > self.max_retries, 'failed'),
+                            else_='draft',
+                        ),
+                        attempt_count=Response.attempt_count + 1,
+                        last_error='publish outcome unknown: stuck in sending',
+                        claimed_by=None,
+                        lease_until=None,
+                    )
+                    .returning(Response.status)
+                )
+                .scalars()
+                .all()
+            )
+        failed = statuses.count('failed')
+        if statuses:
+            logger.warning(
+                '%s responses were stuck in sending: %s back to draft, %s given up',
+                len(statuses),
+                len(statuses) - failed,
+                failed,
+            )
+        return len(statuses)
+
+    def _claim(self, candidates: Select[Any]) -> list[int]:
+        """Lease drafts to this worker and move them to 'sending' with one UPDATE."""
+        with db_helper.session_scope() as session:
+            rows = Response.claim(
+                session,
+                candidates.where(Response.status == 'draft'),
+                owner=self.worker_id,
+                lease=self.sending_timeout,
+                status='sending',
+            )
+        return sorted(row.id for row in rows)
+
+    def _claim_retries(self, drafts: list[Draft]) -> list[Draft]:
+        """Claim drafts due for a retry in this run; drafts taken meanwhile are dropped."""
+        if not drafts:
+            return []
+        claimed = set(
+            self._claim(select(Response.id).where(Response.id.in_([d.id for d in drafts])))
+        )
+        return [d for d in drafts if d.id in claimed]
+
+    def _due(self) -> Any:
+        return or_(Response.next_attempt_at.is_(None), Response.next_attempt_at <= self._now())
+
+    def _load(self, ids: list[int]) -> list[Draft]:
+        """Claimed drafts with their reviews, one joined query."""
+        if not ids:
+            return []
         with db_helper.get_session() as session:
-            query = select(Response.id).where(Response.status == 'draft')
-            ids = (
-                session.execute(query).scalars().fetchmany(limit)
-                if limit
-                else session.execute(query).scalars().all()
+            rows = session.execute(
+                select(Response.id, Response.review_id, Review.wb_id, Response.reply_text)
+                .join(Review, Review.id == Response.review_id)
+                .where(Response.id.in_(ids))
+                .order_by(Response.id)
+            ).all()
+        logger.debug('Claimed %d draft responses to publish', len(rows))
+        return [Draft(*row) for row in rows]
+
+    def _iter_drafts(self, limit: int | None = None) -> Generator[list[Draft]]:
+        """
+        Due drafts (next_attempt_at passed or not set): each chunk is claimed first,
+        then loaded with its reviews by one joined query.
+        """
+        last_id = 0
+        loaded = 0
+        while limit is None or loaded < limit:
+            size = self.chunk_size if limit is None else min(self.chunk_size, limit - loaded)
+            ids = self._claim(
+                select(Response.id)
+                .where(Response.id > last_id, self._due())
+                .order_by(Response.id)
+                .limit(size)
             )
-            logger.debug('Found %d draft responses to publish', len(ids))
-            return list(ids)
+            if not ids:
+                return
+            last_id = ids[-1]
+            loaded += len(ids)
+            yield self._load(ids)
+
+    def _iter_stream(self, batches: Iterable[list[int]]) -> Generator[list[Draft]]:
+        """
+        Due drafts of the given review id batches, as they arrive. An empty batch
+        is passed on as an empty chunk, so the caller can flush while idle. Drafts
+        left by earlier runs (retries, released on stop) are drained first.
+        """
+        yield from self._iter_drafts()
+        for review_ids in batches:
+            ids: list[int] = []
+            for start in range(0, len(review_ids), self.chunk_size):
+                part = review_ids[start : start + self.chunk_size]
+                ids += self._claim(
+                    select(Response.id).where(Response.review_id.in_(part), self._due())
+                )
+            yield self._load(ids)
 
-    def _publish_one(self, resp_id: int) -> bool:
+    def _renew(self, drafts: Iterable[Draft]) -> list[Draft]:
+        """Extend the 'sending' leases of drafts in hand; drafts no longer held are dropped."""
+        drafts = list(drafts)
+        if not drafts:
+            return []
         with db_helper.session_scope() as session:
-            resp = session.get(Response, resp_id)
-            if not resp or resp.status != 'draft':
-                logger.warning('Response %s not found or not in draft state', resp_id)
-                return False
-
-            review = session.get(Review, resp.review_id)
-            if not review:
-                logger.error('Review for response %s not found', resp_id)
-                return False
-
-            logger.info(
-                'Publishing reply (resp_id=%s, review_id=%s, wb_id=%s)',
-                resp_id,
-                review.id,
-                review.wb_id,
+            held = Response.renew(
+                session,
+                self.worker_id,
+                Response.id.in_([d.id for d in drafts]),
+                Response.status == 'sending',
+                lease=self.sending_timeout,
             )
+        lost = [d for d in drafts if d.id not in held]
+        if lost:
+            logger.warning(
+                'Lease lost for %d drafts, skipping them: %s', len(lost), [d.id for d in lost]
+            )
+        return [d for d in drafts if d.id in held]
 
-            self.wb.reply_to_feedback(review.wb_id, resp.reply_text)
+    def _release(self, drafts: list[Draft]) -> None:
+        """Hand claimed drafts that were never posted back to 'draft'."""
+        if not drafts:
+            return
+        with db_helper.session_scope() as session:
+            Response.release(
+                session,
+                self.worker_id,
+                Response.id.in_([d.id for d in drafts]),
+                Response.status == 'sending',
+                status='draft',
+            )
+        logger.info('Released %d claimed drafts', len(drafts))
 
-            now = datetime.datetime.now(datetime.UTC)
-            resp.status = 'published'
-            resp.published_at = now
-            review.status = 'published'
+    def _send(self, draft: Draft) -> None:
+        logger.info(
+            'Publishing reply (resp_id=%s, review_id=%s, wb_id=%s)',
+            draft.id,
+            draft.review_id,
+            draft.wb_id,
+        )
+        self.wb.reply_to_feedback(draft.wb_id, draft.reply_text)
 
-            logger.info('Successfully published reply %s for review %s', resp_id, review.wb_id)
-            return True
+    def _mark_published(self, drafts: list[Draft]) -> int:
+        if not drafts:
+            return 0
+        now = self._now()
+        with db_helper.session_scope() as session:
+            review_ids = (
+                session.execute(
+                    update(Response)
+                    .where(
+                        Response.id.in_([d.id for d in drafts]),
+                        Response.status == 'sending',
+                        Response.claimed_by == self.worker_id,
+                    )
+                    .values(
+                        status='published',
+                        published_at=now,
+                        next_attempt_at=None,
+                        claimed_by=None,
+                        lease_until=None,
+                    )
+                    .returning(Response.review_id)
+                )
+                .scalars()
+                .all()
+            )
+            # only the reviews whose response this worker still held
+            if review_ids:
+                session.execute(
+                    update(Review).where(Review.id.in_(review_ids)).values(status='published')
+                )
+        for draft in drafts:
+            logger.info('Successfully published reply %s for review %s', draft.id, draft.wb_id)
+        return len(review_ids)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with equal jitter: [d/2, d], d = backoff_sec * 2^(attempt-1)."""
+        delay = min(self.max_backoff_sec, self.backoff_sec * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
 
-    def execute(self, *, limit: int | None = None) -> int:
+    def _record_failure(self, draft: Draft, error: Exception) -> float | None:
+        """
+        Persist the failed attempt in its own transaction and release the claim.
+        Returns the delay until the next attempt, None when the response is given up.
+        """
+        with db_helper.session_scope() as session:
+            resp = session.get(Response, draft.id)
+            if resp is None or resp.status != 'sending' or resp.claimed_by != self.worker_id:
+                return None
+            resp.claimed_by = resp.lease_until = None
+            resp.attempt_count += 1
+            resp.last_error = str(error)[:1000]
+            logger.error(
+                'Error publishing response %s (attempt %d/%d): %s',
+                draft.id,
+                resp.attempt_count,
+                self.max_retries + 1,
+                error,
+            )
+            if resp.attempt_count > self.max_retries:
+                resp.status = 'failed'
+                resp.next_attempt_at = None
+                logger.critical(
+                    'Giving up on response %s after %d attempts', draft.id, resp.attempt_count
+                )
+                return None
+            delay = self._backoff(resp.attempt_count)
+            resp.status = 'draft'
+            resp.next_attempt_at = self._now() + datetime.timedelta(seconds=delay)
+        logger.warning('Retrying response %s after %.1fs...', draft.id, delay)
+        return delay
+
+    def execute(
+        self, *, limit: int | None = None, batches: Iterable[list[int]] | None = None
+    ) -> int:
+        """
+        batches=None — all due drafts (up to limit); otherwise only the drafts of each
+        review id batch, published as the batches arrive (streaming pipeline).
+        """
+        self._recover_stale()
         published = 0
-        draft_ids = self._iter_draft_ids(limit)
+        chunks = self._iter_drafts(limit) if batches is None else self._iter_stream(batches)
+        exhausted = False
 
-        if not draft_ids:
-            logger.info('No draft responses found to publish')
-            return 0
+        ready: deque[Draft] = deque()
+        delayed: list[tuple[float, int, Draft]] = []  # heap of (due, resp_id, draft)
+        running: dict[Future[None], Draft] = {}
+        sent: list[Draft] = []
+        write_back_at = 0.0  # deadline for the posts in `sent`
+        renew_every = self.sending_timeout.total_seconds() / 3
+        renew_at = time.monotonic() + renew_every
 
-        for resp_id in draft_ids:
-            attempt = 0
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='publisher') as pool:
             while True:
-                try:
-                    ok = self._publish_one(resp_id)
-                    if ok:
-                        published += 1
+                if self.stop_event.is_set() and not exhausted:
+                    logger.info('Stop requested, finishing %d posts in flight', len(running))
+                    exhausted = True
+                    self._release(list(ready))
+                    ready.clear()
+                    delayed.clear()  # already back in 'draft', due on the next run
+                now = time.monotonic()
+                due: list[Draft] = []
+                while delayed and delayed[0][0] <= now:
+                    due.append(heapq.heappop(delayed)[2])
+                ready.extend(self._claim_retries(due))
+                # load the next chunk only when the workers are about to run dry
+                if len(ready) < self.workers and not exhausted:
+                    chunk = next(chunks, None)
+                    exhausted = chunk is None
+                    ready.extend(chunk or [])
+                # the batch is closed by its deadline, its size or running out of work
+                idle = not (running or ready)
+                if sent and (now >= write_back_at or len(sent) >= self.write_batch_size or idle):
+                    published += self._mark_published(sent)
+                    sent = []
+                if exhausted and not (ready or delayed or running):
                     break
-                except Exception as e:
-                    attempt += 1
-                    logger.error(
-                        'Error publishing response %s (attempt %d/%d): %s',
-                        resp_id,
-                        attempt,
-                        self.max_retries,
-                        e,
-                    )
-                    if attempt > self.max_retries:
-                        logger.critical(
-                            'Giving up on response %s after %d attempts', resp_id, attempt
-                        )
-                        break
-                    backoff = self.backoff_sec * attempt
-                    logger.warning('Retrying response %s after %.1fs...', resp_id, backoff)
-                    time.sleep(backoff)
+                if now >= renew_at:
+                    held = {d.id for d in self._renew([*ready, *running.values()])}
+                    ready = deque(d for d in ready if d.id in held)
+                    renew_at = now + renew_every
+
+                # submit no more than there are workers, so retries due later are not
+                # stuck behind the whole backlog in the executor queue
+                while ready and len(running) < self.workers:
+                    draft = ready.popleft()
+                    running[pool.submit(self._send, draft)] = draft
+
+                next_due = delayed[0][0] - now if delayed else None
+                if not running:
+                    time.sleep(max(0.0, next_due or 0.0))
+                    continue
+
+                timeout = min(renew_at - now, renew_every if next_due is None else next_due)
+                if sent:
+                    timeout = min(timeout, write_back_at - now)
+                done, _ = wait(running, timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+                for future in done:
+                    draft = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        delay = self._record_failure(draft, e)
+                        if delay is not None and delay <= self.retry_within_run:
+                            heapq.heappush(delayed, (time.monotonic() + delay, draft.id, draft))
+                    else:
+                        if not sent:
+                            write_back_at = time.monotonic() + self.write_back_sec
+                        sent.append(draft)
 
+        published += self._mark_published(sent)
         logger.info('Total published responses: %d', published)
         return published
@@ -1,82 +1,518 @@
 from __future__ import annotations
 
-from app.clients import GeminiClient
+import datetime
+import threading
+import time
+from collections.abc import Callable, Generator, Iterable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+from app.clients import GeminiClient, QuotaScheduler, RateLimitExceeded
 from app.core.logger import logger
 from app.core.models import (
     Response,
     Review,
     db_helper,
+    default_worker_id,
 )
 
+from .prompts import DEFAULT_PROMPT_VERSION, PROMPTS
+from .reply_cache import ReplyCache
+from .router import ReviewRouter
+from .similarity import LOCAL_MODEL_PREFIXES, SimilarityIndex
+from .templates import ReplyTemplates
+from .worker import NEW_DRAFTS_CHANNEL
+
+BATCH_REPLY_SCHEMA = {
+    'type': 'ARRAY',
+    'items': {
+        'type': 'OBJECT',
+        'properties': {
+            'id': {'type': 'INTEGER'},
+            'reply': {'type': 'STRING'},
+        },
+        'required': ['id', 'reply'],
+    },
+}
+
+
+@dataclass(frozen=True)
+class PendingReview:
+    id: int
+    wb_id: str
+    text: str | None
+    rating: int | None
+
+
+@dataclass(frozen=True)
+class GeneratedReply:
+    review: PendingReview
+    text: str
+    model: str
+    prompt_version: str | None = None
+
 
 class GenerateRepliesService:
     """
     Use-case: for all Review(status='new') create Response(status='draft').
-    ACID: one transaction per batch (session_scope).
+    Generation: up to `concurrency` Gemini calls in parallel (thread pool);
+    a failed review is logged and skipped, the others go on. The default client gives
+    every call `gemini_timeout` seconds, so one hung request cannot hold a worker.
+    Pending reviews are claimed in chunks of `chunk_size` (anti-join, keyset pagination)
+    and each chunk is finished before the next one is loaded.
+    Scaling out: a chunk is leased to this instance (worker_id) for `lease`, so several
+    processes / nodes can run the service on one database without generating twice;
+    leases of crashed workers expire and are claimed again. While a chunk is in work
+    its leases are renewed every third of `lease`, so a slow chunk keeps them.
+    ACID: drafts are written as results arrive, one short transaction
+    per `write_batch_size` replies (session_scope).
+    Quota: requests wait for the Gemini RPM/TPM budget (QuotaScheduler); reviews hit by
+    a 429 are requeued within the run, up to max_requeues times, instead of being skipped.
+    Routing (optional ReviewRouter): simple reviews go to the light model tier, complex or
+    negative ones to the strong tier; Response.model is the model that actually answered.
+    Batch mode (reviews_per_request > 1): reviews not longer than batch_max_chars are
+    packed into one JSON-output request; reviews missing from the answer fall back
+    to single-review generation.
+    Local fast paths before the LLM, recorded in Response.model:
+    - templates: rating-only reviews get a rotating template reply ('template:<version>');
+    - cache (optional ReplyCache): repeated (rating, text) pairs ('cache:<model>');
+    - similarity (optional SimilarityIndex): paraphrases of answered reviews with the same
+      rating bucket reuse that reply ('similar:<model>'); synced and saved on every run.
     """
 
     def __init__(
         self,
         model_name: str = 'gemini-1.5-flash',
         gemini: GeminiClient | None = None,
+        *,
+        concurrency: int = 4,
+        write_batch_size: int = 50,
+        chunk_size: int = 500,
+        reviews_per_request: int = 1,
+        batch_max_chars: int = 300,
+        cache: ReplyCache | None = None,
+        templates: ReplyTemplates | None = None,
+        use_templates: bool = True,
+        similarity: SimilarityIndex | None = None,
+        quota: QuotaScheduler | None = None,
+        gemini_timeout: float | None = 30.0,
+        max_requeues: int = 3,
+        router: ReviewRouter | None = None,
+        prompt_version: str = DEFAULT_PROMPT_VERSION,
+        worker_id: str | None = None,
+        lease: datetime.timedelta = datetime.timedelta(minutes=10),
     ) -> None:
         self.model_name = model_name
-        self.gem = gemini or GeminiClient(model_name=model_name)
-
-    @staticmethod
-    def _build_prompt(text: str | None, rating: int | None) -> str:
-        base = 'Ты — поддержка бренда. Пиши очень кратко (2 - 4 предложения), дружелюбно, без спама'
-        base += f' Покупатель оценил товар: {rating or 0}/5. '
-        if (text or '').strip():
-            base += f'Отзыв: "{(text or "").strip()}". '
-        else:
-            base += 'Покупатель оставил только оценку без текста.'
-
-        if rating is None or rating == 3:
-            style = 'Нейтрально поблагодари и предложи помощь/уточнение.'
-        elif rating >= 5:
-            style = 'Тепло поблагодари и пригласи вернуться.'
-        elif rating == 4:
-            style = 'Поблагодари и мягко спроси, что можно улучшить.'
-        elif rating == 2:
-            style = 'Извинись, предложи помощь/обмен/возврат, попроси уточнить детали.'
-        else:
-            style = 'Искренне извинись, предложи оперативную помощь/возврат и способ связи.'
-        return base + style
+        # one scheduler for every model this service calls, limits from settings by default
+        self.quota = quota or QuotaScheduler.from_settings()
+        self.gem = gemini or GeminiClient(
+            model_name=model_name, timeout=gemini_timeout, quota=self.quota, context_cache=True
+        )
+        self.max_requeues = max_requeues
+        self.router = router
+        self.prompt = PROMPTS[prompt_version]
+        self.concurrency = max(1, concurrency)
+        self.write_batch_size = max(1, write_batch_size)
+        self.chunk_size = max(1, chunk_size)
+        self.reviews_per_request = max(1, reviews_per_request)
+        self.batch_max_chars = batch_max_chars
+        self.cache = cache
+        self.templates = templates or (ReplyTemplates() if use_templates else None)
+        self.similarity = similarity
+        self.worker_id = worker_id or default_worker_id()
+        self.lease = lease
+        self.stop_event = threading.Event()
 
-    def execute(self) -> int:
-        logger.info('Generating replies for new reviews...')
-        created = 0
+    def stop(self) -> None:
+        """
+        Graceful shutdown: finish the calls in flight, write their drafts and claim
+        nothing more; reviews not started yet are released for the next run.
+        """
+        self.stop_event.set()
+
+    def _build_prompt(self, text: str | None, rating: int | None) -> str:
+        return self.prompt.render(text, rating)
+
+    def _build_batch_prompt(self, reviews: list[PendingReview]) -> str:
+        return self.prompt.render_batch(reviews)
+
+    def _claim_pending(self, session: Session, *criteria: Any) -> list[PendingReview]:
+        """
+        Claim new reviews without a response by a single UPDATE ... RETURNING
+        (anti-join, SKIP LOCKED), ordered by Review.id.
+        """
+        rows = Review.claim(
+            session,
+            select(Review.id)
+            .outerjoin(Response, Response.review_id == Review.id)
+            .where(Review.status == 'new', Response.id.is_(None), *criteria)
+            .order_by(Review.id)
+            .limit(self.chunk_size),
+            owner=self.worker_id,
+            lease=self.lease,
+            returning=(Review.wb_id, Review.text, Review.rating),
+        )
+        # RETURNING order is not guaranteed
+        return [
+            PendingReview(id=r.id, wb_id=r.wb_id, text=r.text, rating=r.rating)
+            for r in sorted(rows, key=lambda r: r.id)
+        ]
+
+    def _iter_pending(self) -> Generator[list[PendingReview]]:
+        """
+        Pending reviews claimed one chunk of chunk_size at a time, keyset-paginated
+        by Review.id: memory stays flat and reviews that failed in this run are not
+        picked up again.
+        """
+        last_id = 0
+        while not self.stop_event.is_set():
+            with db_helper.session_scope() as session:
+                pending = self._claim_pending(session, Review.id > last_id)
+            if not pending:
+                return
+            last_id = pending[-1].id
+            logger.debug('Claimed chunk of %s pending reviews', len(pending))
+            yield pending
+
+    def _iter_stream(self, batches: Iterable[list[str]]) -> Generator[list[PendingReview]]:
+        """
+        Pending reviews out of the given wb_id batches, as they arrive. Reviews left
+        by earlier runs (failed, released on stop, fetched by another process) are
+        drained first, so streaming does not strand them.
+        """
+        yield from self._iter_pending()
+        for wb_ids in batches:
+            if self.stop_event.is_set():
+                return
+            for start in range(0, len(wb_ids), self.chunk_size):
+                with db_helper.session_scope() as session:
+                    pending = self._claim_pending(
+                        session, Review.wb_id.in_(wb_ids[start : start + self.chunk_size])
+                    )
+                if pending:
+                    yield pending
+
+    def _renew(self) -> None:
+        """Extend the leases of every review this worker still holds."""
         with db_helper.session_scope() as session:
-            reviews = session.query(Review).filter(Review.status == 'new').all()
-            logger.debug('Found %s reviews with status=new', len(reviews))
-
-            for r in reviews:
-                existing = session.query(Response.id).filter(Response.review_id == r.id).first()
-                if existing:
-                    logger.debug('Review %s already has a response, skipping', r.wb_id)
-                    continue
-
-                logger.debug('Building prompt for review %s (rating=%s)', r.wb_id, r.rating)
-                prompt = self._build_prompt(r.text, r.rating)
-
-                try:
-                    reply_text = self.gem.generate(prompt)
-                except Exception as e:
-                    logger.error('Gemini failed to generate reply for review %s: %s', r.wb_id, e)
-                    continue
-
-                session.add(
-                    Response(
-                        review_id=r.id,
-                        reply_text=reply_text,
-                        model=self.model_name,
-                        status='draft',
+            held = Review.renew(session, self.worker_id, Review.status == 'new', lease=self.lease)
+        logger.debug('Renewed leases of %s pending reviews', len(held))
+
+    def _generate(self, review: PendingReview) -> GeneratedReply:
+        logger.debug('Building prompt for review %s (rating=%s)', review.wb_id, review.rating)
+        prompt = self._build_prompt(review.text, review.rating)
+        instruction = self.prompt.system_instruction
+        if self.router is None:
+            reply_text, model = self.gem.generate(prompt, instruction), self.model_name
+        else:
+            tier = self.router.classify(review.text, review.rating)
+            reply_text, model = self.router.generate(tier, prompt, instruction)
+        return GeneratedReply(
+            review=review, text=reply_text, model=model, prompt_version=self.prompt.version
+        )
+
+    def _generate_one(
+        self, review: PendingReview, requeue: list[PendingReview]
+    ) -> list[GeneratedReply]:
+        try:
+            return [self._generate(review)]
+        except RateLimitExceeded:
+            logger.warning('Gemini quota hit for review %s, requeueing', review.wb_id)
+            requeue.append(review)
+            return []
+        except Exception as e:
+            logger.error('Gemini failed to generate reply for review %s: %s', review.wb_id, e)
+            return []
+
+    def _generate_batch(
+        self, reviews: list[PendingReview], requeue: list[PendingReview]
+    ) -> list[GeneratedReply]:
+        """
+        One structured-output request for several reviews; the answer is validated
+        against the batch ids, missing reviews are generated one by one.
+        A rate-limited batch is requeued as a whole.
+        """
+        by_id = {r.id: r for r in reviews}
+        replies: dict[int, GeneratedReply] = {}
+        prompt = self._build_batch_prompt(reviews)
+        instruction = self.prompt.batch_system_instruction
+        model = self.model_name
+        try:
+            if self.router is None:
+                answer = self.gem.generate_json(prompt, BATCH_REPLY_SCHEMA, instruction)
+            else:
+                # jobs are grouped by tier, so the first review decides for the batch
+                tier = self.router.classify(reviews[0].text, reviews[0].rating)
+                answer, model = self.router.generate_json(
+                    tier, prompt, BATCH_REPLY_SCHEMA, instruction
+                )
+        except RateLimitExceeded:
+            logger.warning('Gemini quota hit for a batch of %s reviews, requeueing', len(reviews))
+            requeue.extend(reviews)
+            return []
+        except Exception as e:
+            logger.error('Gemini batch request for %s reviews failed: %s', len(reviews), e)
+            answer = []
+
+        for entry in answer if isinstance(answer, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            entry_id, text = entry.get('id'), entry.get('reply')
+            review = by_id.get(entry_id) if isinstance(entry_id, int) else None
+            if review is None or review.id in replies or not isinstance(text, str):
+                continue
+            if text.strip():
+                replies[review.id] = GeneratedReply(
+                    review=review,
+                    text=text.strip(),
+                    model=model,
+                    prompt_version=self.prompt.version,
+                )
+
+        missing = [r for r in reviews if r.id not in replies]
+        if missing:
+            logger.warning(
+                'Batch answer misses %s of %s reviews, generating them one by one',
+                len(missing),
+                len(reviews),
+            )
+        result = list(replies.values())
+        for review in missing:
+            result.extend(self._generate_one(review, requeue))
+        return result
+
+    def _answer_locally(
+        self, pending: list[PendingReview]
+    ) -> tuple[list[GeneratedReply], list[PendingReview]]:
+        """Answer by template, from the cache or by a similar review; the rest goes to the LLM."""
+        local: list[GeneratedReply] = []
+        rest: list[PendingReview] = []
+        for review in pending:
+            if self.templates is not None and self.templates.applies(review.text, review.rating):
+                local.append(
+                    GeneratedReply(
+                        review=review,
+                        text=self.templates.render(review.rating),
+                        model=self.templates.model_label,
                     )
                 )
-                r.status = 'answered'
-                created += 1
-                logger.info('Generated reply for review %s', r.wb_id)
+            else:
+                rest.append(review)
+        if (self.cache is None and self.similarity is None) or not rest:
+            return local, rest
+
+        misses: list[PendingReview] = []
+        with db_helper.get_session() as session:
+            for review in rest:
+                reply = self._from_cache(session, review) or self._from_similar(review)
+                if reply is None:
+                    misses.append(review)
+                else:
+                    local.append(reply)
+        return local, misses
+
+    def _from_cache(self, session: Session, review: PendingReview) -> GeneratedReply | None:
+        if self.cache is None:
+            return None
+        key = self.cache.key(self.model_name, review.rating, review.text)
+        cached = self.cache.get(session, key) if key else None
+        if cached is None:
+            return None
+        return GeneratedReply(review=review, text=cached, model=f'cache:{self.model_name}')
+
+    def _from_similar(self, review: PendingReview) -> GeneratedReply | None:
+        if self.similarity is None:
+            return None
+        similar = self.similarity.query(review.text, review.rating)
+        if similar is None:
+            return None
+        logger.debug(
+            'Review %s reuses response %s (similarity %.2f)',
+            review.wb_id,
+            similar.response_id,
+            similar.similarity,
+        )
+        return GeneratedReply(
+            review=review, text=similar.reply_text, model=f'similar:{self.model_name}'
+        )
+
+    def _jobs(self, pending: list[PendingReview]) -> list[list[PendingReview]]:
+        """Split work into requests: batches of short reviews, the rest one by one."""
+        if self.reviews_per_request <= 1:
+            return [[r] for r in pending]
+        short = [r for r in pending if len((r.text or '').strip()) <= self.batch_max_chars]
+        long = [r for r in pending if len((r.text or '').strip()) > self.batch_max_chars]
+        groups = [short]
+        if self.router is not None:
+            tiers = [self.router.classify(r.text, r.rating) for r in short]
+            groups = [
+                [r for r, t in zip(short, tiers, strict=True) if t == tier]
+                for tier in dict.fromkeys(tiers)
+            ]
+        k = self.reviews_per_request
+        jobs = [group[i : i + k] for group in groups for i in range(0, len(group), k)]
+        return jobs + [[r] for r in long]
+
+    def _run_job(
+        self, job: list[PendingReview]
+    ) -> tuple[list[GeneratedReply], list[PendingReview]]:
+        """Generated replies and the reviews to requeue because of the quota."""
+        requeue: list[PendingReview] = []
+        if len(job) > 1:
+            return self._generate_batch(job, requeue), requeue
+        return self._generate_one(job[0], requeue), requeue
+
+    def _write(
+        self,
+        replies: list[GeneratedReply],
+        on_commit: Callable[[list[int]], None] | None = None,
+    ) -> int:
+        """
+        Store one batch of drafts in its own transaction.
+        Reviews answered meanwhile (status != 'new') or whose lease went to another
+        worker are skipped. The publisher is notified on commit.
+        """
+        if not replies:
+            return 0
+        with db_helper.session_scope() as session:
+            still_new = set(
+                session.execute(
+                    select(Review.id).where(
+                        Review.id.in_([r.review.id for r in replies]),
+                        Review.status == 'new',
+                        Review.claimed_by == self.worker_id,
+                    )
+                ).scalars()
+            )
+            rows = [r for r in replies if r.review.id in still_new]
+            if not rows:
+                return 0
+
+            session.execute(
+                insert(Response),
+                [
+                    {
+                        'review_id': r.review.id,
+                        'reply_text': r.text,
+                        'model': r.model,
+                        'prompt_version': r.prompt_version,
+                        'status': 'draft',
+                    }
+                    for r in rows
+                ],
+            )
+            session.execute(
+                update(Review)
+                .where(Review.id.in_([r.review.id for r in rows]))
+                .values(status='answered', claimed_by=None, lease_until=None)
+            )
+            db_helper.notify(session, NEW_DRAFTS_CHANNEL, str(len(rows)))
+            if self.cache is not None:
+                for r in rows:
+                    key = self.cache.key(self.model_name, r.review.rating, r.review.text)
+                    if key and not r.model.startswith(LOCAL_MODEL_PREFIXES):
+                        self.cache.put(
+                            session,
+                            key,
+                            model=r.model,
+                            rating=r.review.rating,
+                            reply_text=r.text,
+                        )
+
+        for r in rows:
+            logger.info('Generated reply for review %s (%s)', r.review.wb_id, r.model)
+        if on_commit is not None:
+            on_commit([r.review.id for r in rows])
+        return len(rows)
+
+    def _process(
+        self,
+        pool: ThreadPoolExecutor,
+        pending: list[PendingReview],
+        on_commit: Callable[[list[int]], None] | None = None,
+    ) -> int:
+        batch, pending = self._answer_locally(pending)
+        created = 0
+        requeued: dict[int, int] = {}
+        futures: set[Future] = {pool.submit(self._run_job, job) for job in self._jobs(pending)}
+        renew_every = self.lease.total_seconds() / 3
+        renew_at = time.monotonic() + renew_every
+        while futures:
+            if self.stop_event.is_set():
+                futures = {f for f in futures if not f.cancel()}  # keep the ones in flight
+                if not futures:
+                    break
+            if time.monotonic() >= renew_at:
+                self._renew()
+                renew_at = time.monotonic() + renew_every
+            timeout = max(0.0, renew_at - time.monotonic())
+            done, futures = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                replies, limited = future.result()
+                batch.extend(replies)
+                retry = []
+                for review in limited:
+                    requeued[review.id] = requeued.get(review.id, 0) + 1
+                    if requeued[review.id] <= self.max_requeues:
+                        retry.append(review)
+                    else:
+                        logger.warning(
+                            'Review %s is still rate-limited after %s requeues, '
+                            'leaving it for the next run',
+                            review.wb_id,
+                            self.max_requeues,
+                        )
+                if not self.stop_event.is_set():
+                    futures |= {pool.submit(self._run_job, job) for job in self._jobs(retry)}
+            if len(batch) >= self.write_batch_size:
+                created += self._write(batch, on_commit)
+                batch = []
+        return created + self._write(batch, on_commit)
+
+    def execute(
+        self,
+        *,
+        batches: Iterable[list[str]] | None = None,
+        on_commit: Callable[[list[int]], None] | None = None,
+    ) -> int:
+        """
+        batches=None — all pending reviews; otherwise only the reviews of each wb_id
+        batch, processed as the batches arrive (streaming pipeline).
+        on_commit — called with the review ids of every committed batch of drafts.
+        """
+        logger.info('Generating replies for new reviews...')
+        if self.similarity is not None:
+            with db_helper.get_session() as session:
+                self.similarity.sync(session)
+
+        created = 0
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix='replier',
+        ) as pool:
+            try:
+                chunks = self._iter_pending() if batches is None else self._iter_stream(batches)
+                for pending in chunks:
+                    created += self._process(pool, pending, on_commit)
+            finally:
+                # failed reviews are free for any worker again
+                with db_helper.session_scope() as session:
+                    Review.release(session, self.worker_id)
 
+        if self.cache is not None:
+            with db_helper.session_scope() as session:
+                self.cache.maintain(session)
+            logger.info('Reply cache: %s', self.cache.stats)
+        if self.similarity is not None:
+            with db_helper.get_session() as session:
+                self.similarity.sync(session)
+            self.similarity.save()
+        if self.router is not None:
+            for tier, report in self.router.report().items():
+                logger.info('Routing tier %s: %s', tier, report)
         logger.info('Total generated replies: %s', created)
         return created
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import datetime
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.logger import logger
+from app.core.models import ReplyCacheItem
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+_SPACES = re.compile(r'\s+')
+
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    db_hits: int = 0
+    misses: int = 0
+    stores: int = 0
+
+    @property
+    def hits(self) -> int:
+        return self.memory_hits + self.db_hits
+
+
+class ReplyCache:
+    """
+    Cache of generated replies in front of the LLM, keyed on
+    (model, rating, normalized review text).
+    - memory tier: LRU of up to memory_size keys;
+    - DB tier (reply_cache_items): survives restarts, evicted by ttl and max_entries.
+    Every key collects up to `variants` different replies (misses until then),
+    after that hits rotate between them so that replies do not all look the same.
+    Texts longer than max_text_chars are not cached: they practically never repeat.
+    DB methods take the caller's session.
+    """
+
+    def __init__(
+        self,
+        *,
+        variants: int = 3,
+        memory_size: int = 1024,
+        ttl: datetime.timedelta = datetime.timedelta(days=30),
+        max_entries: int = 50_000,
+        max_text_chars: int = 200,
+    ) -> None:
+        self.variants = max(1, variants)
+        self.memory_size = memory_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_text_chars = max_text_chars
+        self.stats = CacheStats()
+        self._lru: OrderedDict[str, list[str]] = OrderedDict()
+        self._turns: dict[str, int] = {}
+        self._used: set[str] = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str | None) -> str:
+        text = (text or '').lower().replace('\u0451', '\u0435')  # yo -> ye
+        text = _NON_WORD.sub(' ', text)
+        return _SPACES.sub(' ', text).strip()
+
+    def key(self, model: str, rating: int | None, text: str | None) -> str | None:
+        normalized = self.normalize(text)
+        if len(normalized) > self.max_text_chars:
+            return None
+        raw = f'{model}|{rating if rating is not None else "-"}|{normalized}'
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _remember(self, key: str, replies: list[str]) -> None:
+        self._lru[key] = replies
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.memory_size:
+            evicted, _ = self._lru.popitem(last=False)
+            self._turns.pop(evicted, None)
+
+    def _load(self, session: Session, key: str) -> list[str]:
+        expires = datetime.datetime.now(datetime.UTC) - self.ttl
+        return list(
+            session.execute(
+                select(ReplyCacheItem.reply_text)
+                .where(ReplyCacheItem.key == key, ReplyCacheItem.created_at >= expires)
+                .order_by(ReplyCacheItem.id)
+                .limit(self.variants)
+            ).scalars()
+        )
+
+    def get(self, session: Session, key: str) -> str | None:
+        """The DB tier is queried outside the lock; only the LRU and counters are locked."""
+        with self._lock:
+            replies = self._lru.get(key)
+            if replies is not None:
+                self._lru.move_to_end(key)
+        from_memory = replies is not None
+        loaded = None if from_memory else self._load(session, key)
+
+        with self._lock:
+            if replies is None:
+                # another thread may have loaded or extended the key meanwhile
+                replies = self._lru.get(key)
+                if replies is None:
+                    replies = loaded or []
+                    self._remember(key, replies)
+
+            if len(replies) < self.variants:
+                self.stats.misses += 1
+                return None
+
+            turn = self._turns.get(key, 0)
+            self._turns[key] = turn + 1
+            self._used.add(key)
+            if from_memory:
+                self.stats.memory_hits += 1
+            else:
+                self.stats.db_hits += 1
+            return replies[turn % len(replies)]
+
+    def put(
+        self,
+        session: Session,
+        key: str,
+        *,
+        model: str,
+        rating: int | None,
+        reply_text: str,
+    ) -> None:
+        with self._lock:
+            replies = self._lru.get(key)
+            if replies is not None and len(replies) >= self.variants:
+                return
+            session.add(ReplyCacheItem(key=key, model=model, rating=rating, reply_text=reply_text))
+            self._remember(key, [*(replies or []), reply_text])
+            self.stats.stores += 1
+
+    def maintain(self, session: Session) -> None:
+        """Touch keys used since the last call, drop expired and least recently used items."""
+        now = datetime.datetime.now(datetime.UTC)
+        with self._lock:
+            used, self._used = self._used, set()
+        if used:
+            session.execute(
+                update(ReplyCacheItem).where(ReplyCacheItem.key.in_(used)).values(last_used_at=now)
+            )
+
+        expired = session.execute(
+            delete(ReplyCacheItem).where(ReplyCacheItem.created_at < now - self.ttl)
+        ).rowcount
+        total = session.execute(select(func.count(ReplyCacheItem.id))).scalar_one()
+        overflow = total - self.max_entries
+        if overflow > 0:
+            oldest = (
+                select(ReplyCacheItem.id)
+                .order_by(ReplyCacheItem.last_used_at, ReplyCacheItem.id)
+                .limit(overflow)
+            )
+            session.execute(delete(ReplyCacheItem).where(ReplyCacheItem.id.in_(oldest)))
+        if expired or overflow > 0:
+            logger.info(
+                'Reply cache eviction: %s expired, %s over the size limit',
+                expired,
+                max(0, overflow),
+            )
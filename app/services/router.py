@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import Any, Literal, TypeVar
+
+from app.clients import GeminiClient, LatencyTracker, QuotaScheduler
+from app.core.logger import logger
+
+from .reply_cache import ReplyCache
+
+T = TypeVar('T')
+Tier = Literal['light', 'strong']
+
+DEFAULT_KEYWORDS = (
+    'брак',
+    'бракован',
+    'возврат',
+    'вернуть',
+    'обман',
+    'подделк',
+    'сломал',
+    'порвал',
+    'не работает',
+    'не пришел',
+    'не тот',
+    'претензи',
+    'жалоб',
+    'ужас',
+)
+
+
+@dataclass
+class TierStats:
+    requests: int = 0
+    failures: int = 0
+    fallbacks: int = 0  # requests of this tier answered by the other one
+    latency: LatencyTracker = field(default_factory=LatencyTracker)
+
+
+class ReviewRouter:
+    """
+    Complexity-based routing between two Gemini tiers:
+    - strong: rating <= negative_rating, text longer than long_text_chars
+      or containing a complaint keyword;
+    - light: everything else (short positive / neutral reviews).
+    A failed call is retried once on the other tier; the caller gets the model
+    that actually answered. stats / report() give per-tier latency and throughput
+    to tune the thresholds.
+    """
+
+    def __init__(
+        self,
+        light: GeminiClient,
+        strong: GeminiClient,
+        *,
+        long_text_chars: int = 200,
+        negative_rating: int = 2,
+        keywords: Iterable[str] = DEFAULT_KEYWORDS,
+    ) -> None:
+        self.clients: dict[Tier, GeminiClient] = {'light': light, 'strong': strong}
+        self.long_text_chars = long_text_chars
+        self.negative_rating = negative_rating
+        self._keywords = re.compile('|'.join(re.escape(k) for k in keywords))
+        self.stats: dict[Tier, TierStats] = {'light': TierStats(), 'strong': TierStats()}
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+
+    @classmethod
+    def create(
+        cls,
+        light_model: str = 'gemini-1.5-flash-8b',
+        strong_model: str = 'gemini-1.5-pro',
+        quota: QuotaScheduler | None = None,
+        timeout: float | None = 30.0,
+        **kwargs: Any,
+    ) -> ReviewRouter:
+        quota = quota or QuotaScheduler.from_settings()  # shared by both tiers
+        return cls(
+            GeminiClient(model_name=light_model, timeout=timeout, quota=quota, context_cache=True),
+            GeminiClient(model_name=strong_model, timeout=timeout, quota=quota, context_cache=True),
+            **kwargs,
+        )
+
+    def classify(self, text: str | None, rating: int | None) -> Tier:
+        if rating is not None and rating <= self.negative_rating:
+            return 'strong'
+        text = (text or '').strip()
+        if len(text) > self.long_text_chars:
+            return 'strong'
+        if self._keywords.search(ReplyCache.normalize(text)):
+            return 'strong'
+        return 'light'
+
+    def _run(self, tier: Tier, call: Callable[[GeminiClient], T]) -> T:
+        stats = self.stats[tier]
+        started = time.monotonic()
+        with self._lock:
+            stats.requests += 1
+        try:
+            result = call(self.clients[tier])
+        except Exception:
+            with self._lock:
+                stats.failures += 1
+            raise
+        stats.latency.observe(time.monotonic() - started)
+        return result
+
+    def call(self, tier: Tier, call: Callable[[GeminiClient], T]) -> tuple[T, str]:
+        """Run `call` on the tier's client, falling back to the other tier once."""
+        try:
+            return self._run(tier, call), self.clients[tier].model_name
+        except Exception as e:
+            other: Tier = 'light' if tier == 'strong' else 'strong'
+            logger.warning('%s tier failed (%s), falling back to %s', tier, e, other)
+            with self._lock:
+                self.stats[tier].fallbacks += 1
+            return self._run(other, call), self.clients[other].model_name
+
+    def generate(
+        self, tier: Tier, prompt: str, system_instruction: str | None = None
+    ) -> tuple[str, str]:
+        return self.call(tier, lambda client: client.generate(prompt, system_instruction))
+
+    def generate_json(
+        self,
+        tier: Tier,
+        prompt: str,
+        schema: dict[str, Any] | None = None,
+        system_instruction: str | None = None,
+    ) -> tuple[Any, str]:
+        return self.call(
+            tier, lambda client: client.generate_json(prompt, schema, system_instruction)
+        )
+
+    def report(self) -> dict[str, dict[str, float | None]]:
+        """Per tier: requests, failures, fallbacks, p50/p95 latency and replies per second."""
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        report: dict[str, dict[str, float | None]] = {}
+        for tier, stats in self.stats.items():
+            answered = stats.requests - stats.failures
+            report[tier] = {
+                'requests': stats.requests,
+                'failures': stats.failures,
+                'fallbacks': stats.fallbacks,
+                'p50': stats.latency.quantile(0.5),
+                'p95': stats.latency.quantile(0.95),
+                'rps': answered / elapsed,
+            }
+        return report
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import os
+import pickle
+import random
+import threading
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.core.logger import logger
+from app.core.models import Response, Review
+
+from .reply_cache import ReplyCache
+from .templates import rating_bucket
+
+_PRIME = (1 << 61) - 1
+_FORMAT_VERSION = 1
+# replies copied from elsewhere (templates, cache, this index) are not indexed again
+LOCAL_MODEL_PREFIXES = ('template:', 'cache:', 'similar:')
+
+
+@dataclass(frozen=True)
+class SimilarReply:
+    response_id: int
+    reply_text: str
+    similarity: float
+
+
+@dataclass
+class _Entry:
+    response_id: int
+    bucket: str
+    reply_text: str
+    signature: tuple[int, ...]
+
+
+class SimilarityIndex:
+    """
+    Local near-duplicate index of answered reviews: MinHash over character
+    shingles of the normalized text, LSH bands for candidate lookup, pure CPU.
+    - query() returns the most similar indexed reply of the same rating bucket
+      when the estimated Jaccard similarity is >= threshold;
+    - sync() adds responses created since the last sync (watermark: Response.id);
+    - save()/load from `path` keep restarts fast, the index is not rebuilt from scratch.
+    bands * rows = num_perm; bands=16, rows=4 finds pairs from ~0.5 similarity on.
+    """
+
+    def __init__(
+        self,
+        path: str | Path | None = None,
+        *,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 3,
+        threshold: float = 0.7,
+        max_text_chars: int = 300,
+        max_entries: int = 50_000,
+        seed: int = 1,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError('num_perm must be divisible by bands')
+        self.path = Path(path) if path is not None else None
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+        self.max_text_chars = max_text_chars
+        self.max_entries = max_entries
+        self.seed = seed
+        rnd = random.Random(seed)
+        self._perms = [(rnd.randrange(1, _PRIME), rnd.randrange(_PRIME)) for _ in range(num_perm)]
+        self.last_response_id = 0
+        self._entries: list[_Entry] = []
+        self._buckets: defaultdict[tuple[int, tuple[int, ...]], list[int]] = defaultdict(list)
+        self._lock = threading.Lock()
+        if self.path is not None:
+            self.load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def _params(self) -> tuple[int, int, int, int]:
+        return self.num_perm, self.bands, self.shingle_size, self.seed
+
+    def _shingles(self, text: str) -> set[int]:
+        k = self.shingle_size
+        padded = f' {text} '
+        if len(padded) <= k:
+            return {zlib.crc32(padded.encode())}
+        return {zlib.crc32(padded[i : i + k].encode()) for i in range(len(padded) - k + 1)}
+
+    def signature(self, text: str | None) -> tuple[int, ...] | None:
+        normalized = ReplyCache.normalize(text)
+        if not normalized or len(normalized) > self.max_text_chars:
+            return None
+        shingles = self._shingles(normalized)
+        return tuple(min((a * s + b) % _PRIME for s in shingles) for a, b in self._perms)
+
+    def _band_keys(self, signature: tuple[int, ...]) -> list[tuple[int, tuple[int, ...]]]:
+        r = self.rows
+        return [(band, signature[band * r : (band + 1) * r]) for band in range(self.bands)]
+
+    def _index(self, entry: _Entry) -> None:
+        position = len(self._entries)
+        self._entries.append(entry)
+        for key in self._band_keys(entry.signature):
+            self._buckets[key].append(position)
+
+    def _rebuild(self, entries: list[_Entry]) -> None:
+        self._entries = []
+        self._buckets = defaultdict(list)
+        for entry in entries:
+            self._index(entry)
+
+    def add(self, response_id: int, text: str | None, rating: int | None, reply_text: str) -> bool:
+        signature = self.signature(text)
+        if signature is None or not reply_text.strip():
+            return False
+        with self._lock:
+            self._index(_Entry(response_id, rating_bucket(rating), reply_text, signature))
+            self.last_response_id = max(self.last_response_id, response_id)
+        return True
+
+    def query(self, text: str | None, rating: int | None) -> SimilarReply | None:
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        bucket = rating_bucket(rating)
+        best: SimilarReply | None = None
+        with self._lock:
+            candidates = {
+                position
+                for key in self._band_keys(signature)
+                for position in self._buckets.get(key, ())
+            }
+            for position in candidates:
+                entry = self._entries[position]
+                if entry.bucket != bucket:
+                    continue
+                same = sum(x == y for x, y in zip(signature, entry.signature, strict=True))
+                similarity = same / self.num_perm
+                if similarity >= self.threshold and (best is None or similarity > best.similarity):
+                    best = SimilarReply(entry.response_id, entry.reply_text, similarity)
+        return best
+
+    def sync(self, session: Session, *, chunk_size: int = 1000) -> int:
+        """Index responses created since the last sync, in keyset chunks by Response.id."""
+        added = 0
+        while True:
+            rows = session.execute(
+                select(Response.id, Review.text, Review.rating, Response.reply_text)
+                .join(Review, Review.id == Response.review_id)
+                .where(
+                    Response.id > self.last_response_id,
+                    ~or_(*(Response.model.startswith(p) for p in LOCAL_MODEL_PREFIXES)),
+                )
+                .order_by(Response.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            for response_id, text, rating, reply_text in rows:
+                added += self.add(response_id, text, rating, reply_text)
+            with self._lock:
+                self.last_response_id = max(self.last_response_id, rows[-1][0])
+
+        if len(self._entries) > self.max_entries:
+            with self._lock:
+                self._rebuild(self._entries[-self.max_entries :])
+        if added:
+            logger.info('Similarity index: %s replies added, %s total', added, len(self))
+        return added
+
+    def save(self) -> None:
+        """Atomically write the index to `path` (temp file + rename)."""
+        if self.path is None:
+            return
+        with self._lock:
+            state = {
+                'version': _FORMAT_VERSION,
+                'params': self._params,
+                'last_response_id': self.last_response_id,
+                'entries': [
+                    (e.response_id, e.bucket, e.reply_text, e.signature) for e in self._entries
+                ],
+            }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + '.tmp')
+        with tmp.open('wb') as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.path)
+
+    def load(self) -> bool:
+        """Load a saved index; a missing, broken or incompatible file leaves it empty."""
+        if self.path is None or not self.path.exists():
+            return False
+        try:
+            with self.path.open('rb') as f:
+                state = pickle.load(f)
+        except Exception as e:
+            logger.warning('Similarity index %s is unreadable, rebuilding: %s', self.path, e)
+            return False
+        if state.get('version') != _FORMAT_VERSION or tuple(state.get('params', ())) != (
+            self._params
+        ):
+            logger.warning('Similarity index %s has other parameters, rebuilding', self.path)
+            return False
+        with self._lock:
+            self._rebuild([_Entry(*entry) for entry in state['entries']])
+            self.last_response_id = state['last_response_id']
+        logger.info('Similarity index loaded from %s: %s replies', self.path, len(self))
+        return True
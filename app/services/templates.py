@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Mapping, Sequence
+
+DEFAULT_TEMPLATES: dict[str, tuple[str, ...]] = {
+    'excellent': (
+        'Спасибо за высокую оценку! Рады, что покупка понравилась. Ждём вас снова!',
+        'Благодарим за пять звёзд! Приятно, что товар оправдал ожидания. Возвращайтесь!',
+        'Спасибо, что выбрали нас и поставили отличную оценку! Будем рады видеть вас снова.',
+    ),
+    'good': (
+        'Спасибо за хорошую оценку! Будем рады узнать, что можно сделать ещё лучше.',
+        'Благодарим за отзыв! Если есть пожелания по товару — напишите, мы их учтём.',
+        'Спасибо, что оценили покупку! Подскажите, чего не хватило до пяти звёзд?',
+    ),
+    'neutral': (
+        'Спасибо за оценку! Если появятся вопросы по товару, напишите нам — поможем.',
+        'Благодарим за отзыв! Расскажите, что можно улучшить, — мы обязательно учтём.',
+        'Спасибо, что поделились оценкой! Мы на связи, если понадобится помощь.',
+    ),
+    'poor': (
+        'Нам жаль, что покупка не порадовала. Напишите, что случилось, — поможем.',
+        'Извините за неудобства! Опишите проблему подробнее, и мы предложим решение.',
+        'Сожалеем, что товар не оправдал ожиданий. Напишите нам — разберёмся и поможем.',
+    ),
+    'bad': (
+        'Приносим искренние извинения! Напишите нам в чат — оперативно оформим возврат или обмен.',
+        'Очень жаль, что так вышло. Напишите нам через поддержку WB — поможем как можно быстрее.',
+        'Просим прощения за негативный опыт! Опишите проблему в чате — мы сразу займёмся ею.',
+    ),
+}
+
+
+def rating_bucket(rating: int | None) -> str:
+    if rating is None or rating == 3:
+        return 'neutral'
+    if rating >= 5:
+        return 'excellent'
+    if rating == 4:
+        return 'good'
+    if rating == 2:
+        return 'poor'
+    return 'bad'
+
+
+class ReplyTemplates:
+    """
+    Local replies for rating-only reviews (no text): no LLM call.
+    Phrasings rotate within a rating bucket; Response.model records 'template:<version>'.
+    """
+
+    def __init__(
+        self,
+        templates: Mapping[str, Sequence[str]] | None = None,
+        *,
+        version: str = 'v1',
+    ) -> None:
+        self.templates = {
+            bucket: tuple(phrases) for bucket, phrases in (templates or DEFAULT_TEMPLATES).items()
+        }
+        self.version = version
+        self._turns: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def model_label(self) -> str:
+        return f'template:{self.version}'
+
+    bucket = staticmethod(rating_bucket)
+
+    def applies(self, text: str | None, rating: int | None) -> bool:
+        return not (text or '').strip() and bool(self.templates.get(self.bucket(rating)))
+
+    def render(self, rating: int | None) -> str:
+        bucket = self.bucket(rating)
+        phrases = self.templates[bucket]
+        with self._lock:
+            turn = self._turns.get(bucket, 0)
+            self._turns[bucket] = turn + 1
+        return phrases[turn % len(phrases)]
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable
+from typing import Protocol
+
+from app.core.logger import logger
+from app.core.models import db_helper
+
+# NOTIFY channels, sent after new work is committed
+NEW_REVIEWS_CHANNEL = 'ai_replies_new_reviews'  # fetcher -> replier
+NEW_DRAFTS_CHANNEL = 'ai_replies_new_drafts'  # replier -> publisher
+
+
+class Stage(Protocol):
+    def execute(self) -> int: ...
+    def stop(self) -> None: ...
+
+
+class StageWorker:
+    """
+    Runs one stage (replier / publisher) as its own long-lived process:
+    - LISTENs on the upstream channel and runs the stage as soon as a NOTIFY arrives,
+      so new work is picked up in well under a second instead of a polling interval;
+    - runs it every poll_interval seconds anyway, a safety net for lost notifications
+      (listener reconnects, work committed by older versions);
+    - the LISTEN starts before the first run, so nothing committed meanwhile is missed;
+    - a failed run is logged and retried on the next wake-up; a failed listener is
+      re-opened after reconnect_sec, doubling up to max_reconnect_sec, and the stage
+      runs right after, for whatever was committed while it was down.
+    """
+
+    def __init__(
+        self,
+        service: Stage,
+        channel: str,
+        *,
+        poll_interval: float = 60.0,
+        reconnect_sec: float = 1.0,
+        max_reconnect_sec: float = 60.0,
+    ) -> None:
+        self.service = service
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.reconnect_sec = reconnect_sec
+        self.max_reconnect_sec = max_reconnect_sec
+        self.stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+        self.service.stop()
+
+    def _wait(self, wait: Callable[[float], list[str]]) -> str:
+        deadline = time.monotonic() + self.poll_interval
+        while not self.stop_event.is_set():
+            left = deadline - time.monotonic()
+            if left <= 0:
+                return 'poll'
+            if wait(min(left, 1.0)):  # short slices keep stop() responsive
+                return 'notify'
+        return 'stop'
+
+    def _execute(self) -> int:
+        try:
+            return self.service.execute()
+        except Exception:
+            logger.exception('Stage on %s failed, retrying on the next wake-up', self.channel)
+            return 0
+
+    def run(self) -> int:
+        total = 0
+        delay = self.reconnect_sec
+        while not self.stop_event.is_set():
+            try:
+                with db_helper.listen(self.channel) as listener:
+                    logger.info(
+                        'Worker listening on %s (poll every %ss)', self.channel, self.poll_interval
+                    )
+                    delay = self.reconnect_sec
+                    while not self.stop_event.is_set():
+                        total += self._execute()
+                        reason = self._wait(listener.wait)
+                        logger.debug('Worker on %s woken up by %s', self.channel, reason)
+            except Exception:
+                logger.exception(
+                    'Listener on %s failed, reconnecting in %.1fs', self.channel, delay
+                )
+                self.stop_event.wait(delay)
+                delay = min(self.max_reconnect_sec, delay * 2)
+        logger.info('Worker on %s stopped, processed %s items', self.channel, total)
+        return total
@@ -0,0 +1,61 @@
+import queue
+import threading
+from collections.abc import Generator, Iterator
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def prefetch[T](iterator: Iterator[T], depth: int) -> Generator[T]:
+    """
+    Run `iterator` in a background thread and keep up to `depth` items ready
+    ahead of the consumer (bounded buffer, so memory stays capped).
+    Errors of the producer are re-raised to the consumer; closing the returned
+    generator stops the producer and closes `iterator` in its thread.
+    """
+    if depth <= 0:
+        yield from iterator
+        return
+
+    buffer: queue.Queue[object] = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            return True
+        return False
+
+    def produce() -> None:
+        try:
+            for item in iterator:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name='prefetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item  # type: ignore[misc]
+    finally:
+        stop.set()
+        producer.join()
@@ -4,6 +4,7 @@ from typing import Any
 import pytest
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
 from app.clients.gemini_client import GeminiClient
 from app.clients.wb_client import WBClient
@@ -11,11 +12,8 @@ from app.core.models.base import Base
 from app.core.models.db_helper import DataBaseHelper
 
 
-@pytest.fixture(scope='function')
-def db():
-    """In-memory SQLite для каждого теста"""
-    url = 'sqlite+pysqlite:///:memory:'
-    engine = create_engine(url, future=True)
+def _make_db(url: str, **engine_kwargs: Any):
+    engine = create_engine(url, future=True, **engine_kwargs)
     Base.metadata.create_all(engine)
 
     SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
@@ -27,30 +25,65 @@ def db():
     import app.services.fetcher as s_fetcher
     import app.services.publisher as s_publisher
     import app.services.replier as s_replier
+    import app.services.worker as s_worker
 
     s_fetcher.db_helper = helper
     s_replier.db_helper = helper
     s_publisher.db_helper = helper
+    s_worker.db_helper = helper
+    return helper
+
+
+@pytest.fixture(scope='function')
+def db():
+    """In-memory SQLite для каждого теста"""
+    # one shared connection, so worker threads see the same in-memory database
+    helper = _make_db(
+        'sqlite+pysqlite:///:memory:',
+        connect_args={'check_same_thread': False},
+        poolclass=StaticPool,
+    )
 
     yield helper
 
-    engine.dispose()
+    helper.engine.dispose()
+
+
+@pytest.fixture(scope='function')
+def file_db(tmp_path):
+    """SQLite-файл: одна БД для всех потоков (тесты на воркерах)"""
+    helper = _make_db(f'sqlite+pysqlite:///{tmp_path / "test.db"}')
+
+    yield helper
+
+    helper.engine.dispose()
+
+
+def make_feedback(wb_id: str, **overrides: Any) -> dict:
+    item = {
+        'id': wb_id,
+        'text': 'Спасибо, всё подошло',
+        'productValuation': 5,
+        'createdDate': datetime.datetime.now(datetime.UTC).isoformat(),
+        'userName': 'Тест',
+        'productDetails': {'nmId': 111},
+    }
+    item.update(overrides)
+    return item
 
 
 class FakeWBClient(WBClient):
-    def __init__(self):
+    def __init__(self, pages: list[list[dict]] | None = None):
         self.replies = []
+        self.pages = pages if pages is not None else [[make_feedback('WB1')]]
+        self.pages_requested = 0
+        self.calls: list[dict] = []
 
-    def list_feedbacks(self, **_: Any):
-        now = datetime.datetime.now(datetime.UTC).isoformat()
-        yield {
-            'id': 'WB1',
-            'text': 'Спасибо, всё подошло',
-            'productValuation': 5,
-            'createdDate': now,
-            'userName': 'Тест',
-            'productDetails': {'nmId': 111},
-        }
+    def list_feedback_pages(self, **kwargs: Any):
+        self.calls.append(kwargs)
+        for page in self.pages:
+            self.pages_requested += 1
+            yield page
 
     def reply_to_feedback(self, feedback_id: str | int, text: str):
         self.replies.append((feedback_id, text))
@@ -60,7 +93,7 @@ class FakeGeminiClient(GeminiClient):
     def __init__(self, model='fake-model'):
         pass
 
-    def generate(self, _: str) -> str:
+    def generate(self, _: str, system_instruction: str | None = None) -> str:  # noqa: ARG002
         return 'Тестовый ответ'
 
 
@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.clients import AsyncGeminiClient, QuotaLimits, QuotaScheduler
+
+
+class FakeModels:
+    """First request hangs, the following ones answer after `delay` seconds."""
+
+    def __init__(self, delay: float = 0.01):
+        self.delay = delay
+        self.requests = 0
+        self.cancelled = 0
+
+    async def generate_content(self, *, model, contents, config=None):  # noqa: ARG002
+        self.requests += 1
+        try:
+            await asyncio.sleep(10 if self.requests == 1 else self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return SimpleNamespace(text=f'  ответ {self.requests}  ')
+
+
+def make_client(models: FakeModels, **kwargs) -> AsyncGeminiClient:
+    client = AsyncGeminiClient(api_key='test', **kwargs)
+    client.client = SimpleNamespace(aio=SimpleNamespace(models=models))
+    return client
+
+
+def test_async_gemini_hedges_slow_request():
+    models = FakeModels()
+    quota = QuotaScheduler(default=QuotaLimits(tpm=600))  # a request of 'prompt' is ~257
+    client = make_client(models, deadline=2, hedge_after=0.05, hedge_budget=1.0, quota=quota)
+
+    assert asyncio.run(client.generate('prompt')) == 'ответ 2'
+    assert quota.try_acquire(client.model_name, 300)  # the hedge's reservation is given back
+    assert models.requests == 2
+    assert models.cancelled == 1
+    assert (client.stats.hedges, client.stats.hedge_wins) == (1, 1)
+    assert client.latency.quantile(0.5) is not None
+
+
+def test_async_gemini_deadline_without_hedging():
+    models = FakeModels()
+    client = make_client(models, deadline=0.1, hedge_quantile=None)
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(client.generate('prompt'))
+    assert models.requests == 1
+    assert client.stats.timeouts == 1
+    assert client.hedge_threshold() is None
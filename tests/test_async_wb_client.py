@@ -0,0 +1,40 @@
+import asyncio
+
+from app.clients import AsyncWBClient, TokenBucket
+from app.clients.interfaces import IAsyncApiClient
+
+
+class FakeAsyncTransport(IAsyncApiClient):
+    def __init__(self, pages: list[list[dict]]):
+        super().__init__()
+        self.pages = pages
+        self.limited_once = False
+        self.posted: list[dict] = []
+
+    async def get(self, url, *, headers=None, params=None, timeout=30):  # noqa: ARG002
+        if not self.limited_once:
+            self.limited_once = True
+            self._check_status(429, {'Retry-After': '0'}, url)
+        offset = 0
+        for page in self.pages:
+            if offset == params['skip']:
+                return {'data': {'feedbacks': page}}
+            offset += len(page)
+        return {'data': {'feedbacks': []}}
+
+    async def post(self, url, *, headers=None, json=None, timeout=30):  # noqa: ARG002
+        self.posted.append(json)
+
+
+def test_async_wb_client_pages_and_replies():
+    transport = FakeAsyncTransport(pages=[[{'id': 'WB1'}, {'id': 'WB2'}], [{'id': 'WB3'}]])
+    client = AsyncWBClient(token='t', transport=transport, rate_limiter=TokenBucket(rate=100))
+
+    async def run() -> list[str]:
+        ids = [item['id'] async for item in client.list_feedbacks(is_answered=False, page_size=2)]
+        await client.reply_to_feedback('WB1', 'Спасибо!')
+        return ids
+
+    assert asyncio.run(run()) == ['WB1', 'WB2', 'WB3']
+    assert transport.limited_once
+    assert transport.posted == [{'id': 'WB1', 'text': 'Спасибо!'}]
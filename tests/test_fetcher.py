@@ -1,7 +1,11 @@
-from sqlalchemy import select
+import datetime
+
+import pytest
+from sqlalchemy import func, select
 
 from app.core.models import Review
 from app.services import FetchNewReviewsService
+from tests.conftest import FakeWBClient, make_feedback
 
 
 def test_fetcher_inserts_review(db, fake_wb):
@@ -14,3 +18,75 @@ def test_fetcher_inserts_review(db, fake_wb):
         reviews = session.execute(select(Review)).scalars().all()
         assert len(reviews) == 1
         assert reviews[0].user_name == 'Тест'
+
+
+def test_fetcher_dedups_pages_in_bulk(db, fake_wb):
+    fake_wb.pages = [
+        [make_feedback('WB1'), make_feedback('WB2'), make_feedback('WB2')],
+        [make_feedback('WB2'), make_feedback('WB3'), make_feedback('')],
+    ]
+    svc = FetchNewReviewsService(wb_client=fake_wb)
+
+    assert svc.execute() == 3
+    assert svc.execute() == 0
+
+    with db.get_session() as session:
+        wb_ids = session.execute(select(Review.wb_id).order_by(Review.wb_id)).scalars().all()
+        assert wb_ids == ['WB1', 'WB2', 'WB3']
+
+
+def test_fetcher_uses_cursor_between_reconciles(db, fake_wb):  # noqa: ARG001
+    newest = datetime.datetime.now(datetime.UTC).replace(microsecond=0) - datetime.timedelta(
+        hours=1
+    )
+    fake_wb.pages = [[make_feedback('WB1', createdDate=newest.isoformat())]]
+    svc = FetchNewReviewsService(wb_client=fake_wb, overlap=datetime.timedelta(minutes=10))
+
+    svc.execute(window_days=3)
+    svc.execute(window_days=3)
+    svc.execute(window_days=3, reconcile=True)
+
+    first, incremental, reconcile = (call['date_from'] for call in fake_wb.calls)
+    assert incremental == int((newest - datetime.timedelta(minutes=10)).timestamp())
+    assert first < incremental
+    assert reconcile < incremental
+
+
+def test_fetcher_stops_on_known_streak(db, fake_wb):  # noqa: ARG001
+    fake_wb.pages = [[make_feedback('WB1'), make_feedback('WB2')]]
+    FetchNewReviewsService(wb_client=fake_wb).execute()
+
+    fake_wb.pages = [
+        [make_feedback('WB3'), make_feedback('WB1')],
+        [make_feedback('WB2'), make_feedback('WB0')],
+        [make_feedback('WB4')],
+    ]
+    fake_wb.pages_requested = 0
+    svc = FetchNewReviewsService(wb_client=fake_wb)
+    created = svc.execute(page_size=2, max_total=10, stop_after_known=2)
+
+    assert created == 2
+    assert fake_wb.pages_requested == 2
+    assert svc.last_stats is not None
+    assert svc.last_stats.stopped_early
+    assert svc.last_stats.pages_saved == 3
+
+
+def test_fetcher_chunked_commits_survive_failure(db):
+    class FailingWBClient(FakeWBClient):
+        def list_feedback_pages(self, **kwargs):
+            yield from super().list_feedback_pages(**kwargs)
+            raise RuntimeError('WB is down')
+
+    wb = FailingWBClient(
+        pages=[[make_feedback('WB1'), make_feedback('WB2')], [make_feedback('WB3')]]
+    )
+    svc = FetchNewReviewsService(wb_client=wb)
+
+    with pytest.raises(RuntimeError):
+        svc.execute(commit_every=1)
+
+    assert svc.last_stats is not None
+    assert svc.last_stats.commits == 2
+    with db.get_session() as session:
+        assert session.execute(select(func.count(Review.id))).scalar_one() == 3
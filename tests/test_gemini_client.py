@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+from app.clients import GeminiClient
+
+
+class FakeSdk:
+    def __init__(self, cache_error: Exception | None = None):
+        self.cache_error = cache_error
+        self.cache_creates = 0
+        self.configs: list = []
+        self.caches = SimpleNamespace(create=self.create_cache)
+        self.models = SimpleNamespace(generate_content=self.generate_content)
+
+    def create_cache(self, *, model, config):  # noqa: ARG002
+        self.cache_creates += 1
+        if self.cache_error:
+            raise self.cache_error
+        return SimpleNamespace(name='cachedContents/abc')
+
+    def generate_content(self, *, model, contents, config=None):  # noqa: ARG002
+        self.configs.append(config)
+        return SimpleNamespace(text='ответ')
+
+
+def test_gemini_client_uses_context_cache_or_system_instruction():
+    client = GeminiClient(api_key='test', context_cache=True, context_cache_min_tokens=1)
+    client.client = sdk = FakeSdk()
+
+    assert client.generate('payload', 'static prefix') == 'ответ'
+    assert client.generate('payload 2', 'static prefix') == 'ответ'
+    assert sdk.cache_creates == 1
+    assert [c.cached_content for c in sdk.configs] == ['cachedContents/abc'] * 2
+    assert sdk.configs[0].system_instruction is None
+
+    fallback = GeminiClient(api_key='test', context_cache=True, context_cache_min_tokens=1)
+    fallback.client = sdk = FakeSdk(cache_error=RuntimeError('too few tokens to cache'))
+    fallback.generate('payload', 'static prefix')
+    fallback.generate('payload', 'static prefix')
+    assert sdk.cache_creates == 1  # not retried for the same instruction
+    assert [c.system_instruction for c in sdk.configs] == ['static prefix'] * 2
+
+    short = GeminiClient(api_key='test', context_cache=True)  # the API minimum: 32k tokens
+    short.client = sdk = FakeSdk()
+    short.generate('payload', 'static prefix')
+    short.generate('payload', 'static prefix')
+    assert sdk.cache_creates == 0  # too short to cache: no create call bound to fail
+    assert [c.system_instruction for c in sdk.configs] == ['static prefix'] * 2
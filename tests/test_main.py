@@ -0,0 +1,69 @@
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+import app.main as main
+from app.main import build_parser, run_cycle
+from app.services import ReviewsPipeline
+
+
+def test_run_cycle_skips_when_lock_is_taken(db, fake_wb, fake_gemini, monkeypatch):
+    pipeline = ReviewsPipeline()
+    pipeline.fetcher.wb_client = fake_wb
+    pipeline.replier.gem = fake_gemini
+    pipeline.publisher.wb = fake_wb
+
+    @contextmanager
+    def taken(_: str):
+        yield False
+
+    monkeypatch.setattr(main.db_helper, 'advisory_lock', taken)
+    assert run_cycle(pipeline) is None
+    assert fake_wb.pages_requested == 0
+
+    monkeypatch.setattr(main.db_helper, 'advisory_lock', db.advisory_lock)  # SQLite: no-op
+    assert run_cycle(pipeline)['published_responses'] == 1
+
+    pipeline.stop()
+    assert run_cycle(pipeline) is None  # stopped daemons start no new cycles
+
+    args = build_parser().parse_args(['run-scheduler', '--hours', '3', '--jitter', '30'])
+    assert (args.handler, args.hours, args.jitter) == (main.run_scheduler, 3, 30)
+
+
+def test_run_scheduler_disposes_the_pool_after_the_cycle(db, monkeypatch):
+    events: list[str] = []
+    handlers = {}
+    started = threading.Event()
+
+    class SlowPipeline:
+        def __init__(self, streaming: bool) -> None:  # noqa: ARG002
+            self.stop_event = threading.Event()
+
+        def stop(self) -> None:
+            self.stop_event.set()
+
+        def run(self) -> dict:
+            started.set()
+            self.stop_event.wait(5)
+            time.sleep(0.2)  # writing back the items in hand
+            events.append('cycle finished')
+            return {}
+
+    def send_sigterm() -> None:
+        # sent even if the cycle never starts, so the scheduler always exits
+        started.wait(5)
+        handlers[signal.SIGTERM](signal.SIGTERM, None)
+
+    monkeypatch.setattr(main, 'ReviewsPipeline', SlowPipeline)
+    monkeypatch.setattr(main.signal, 'signal', handlers.__setitem__)
+    monkeypatch.setattr(main.db_helper, 'advisory_lock', db.advisory_lock)  # SQLite: no-op
+    monkeypatch.setattr(main.db_helper, 'dispose', lambda: events.append('disposed'))
+
+    sender = threading.Thread(target=send_sigterm)
+    sender.start()
+    main.run_scheduler(build_parser().parse_args(['run-scheduler']))
+    sender.join(timeout=5)
+
+    assert events == ['cycle finished', 'disposed']
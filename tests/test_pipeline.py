@@ -1,4 +1,9 @@
+import datetime
+import time
+
+from app.core.models import Response, Review
 from app.services import ReviewsPipeline
+from tests.conftest import make_feedback
 
 
 def test_pipeline_end_to_end(
@@ -17,4 +22,57 @@ def test_pipeline_end_to_end(
     assert result['fetched_reviews'] == 1
     assert result['drafted_responses'] == 1
     assert result['published_responses'] == 1
+    assert result['total_sec'] >= result['fetch_sec']
     assert fake_wb.replies
+
+
+def test_pipeline_streaming_publishes_while_fetching(file_db, fake_wb, fake_gemini):  # noqa: ARG001
+    class PagedWB(type(fake_wb)):
+        def list_feedback_pages(self, **kwargs):
+            self.calls.append(kwargs)
+            for i, page in enumerate(self.pages):
+                if i:  # the previous page has to reach WB as a reply first
+                    deadline = time.monotonic() + 5
+                    while len(self.replies) < i and time.monotonic() < deadline:
+                        time.sleep(0.01)
+                    self.overlapped = self.overlapped and len(self.replies) >= i
+                yield page
+
+    wb = PagedWB(pages=[[make_feedback(f'WB{i}')] for i in range(3)])
+    wb.overlapped = True
+
+    pipeline = ReviewsPipeline(streaming=True, idle_flush_sec=0.05)
+    pipeline.fetcher.wb_client = wb
+    pipeline.replier.gem = fake_gemini
+    pipeline.publisher.wb = wb
+
+    result = pipeline.run()
+
+    assert wb.overlapped
+    assert wb.calls[0]['prefetch'] == 1
+    assert result['fetched_reviews'] == result['drafted_responses'] == 3
+    assert result['published_responses'] == 3
+    assert {'fetch_sec', 'generate_sec', 'publish_sec', 'total_sec'} <= result.keys()
+
+
+def test_pipeline_streaming_drains_earlier_backlog(file_db, fake_wb, fake_gemini):
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with file_db.session_scope() as session:
+        # left by earlier runs: a review without a reply and an unpublished draft
+        session.add(Review(wb_id='OLD1', text='Ок', rating=5, created_at=aware, status='new'))
+        answered = Review(wb_id='OLD2', text='Ок', rating=5, created_at=aware, status='answered')
+        answered.response = Response(reply_text='Ответ', status='draft')
+        session.add(answered)
+
+    fake_wb.pages = []  # nothing new on WB
+    pipeline = ReviewsPipeline(streaming=True, idle_flush_sec=0.05)
+    pipeline.fetcher.wb_client = fake_wb
+    pipeline.replier.gem = fake_gemini
+    pipeline.publisher.wb = fake_wb
+
+    result = pipeline.run()
+
+    assert result['fetched_reviews'] == 0
+    assert result['drafted_responses'] == 1
+    assert result['published_responses'] == 2
+    assert sorted(wb_id for wb_id, _ in fake_wb.replies) == ['OLD1', 'OLD2']
@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.prefetch import prefetch
+
+
+def test_prefetch_keeps_order_and_bounds_buffer():
+    produced: list[int] = []
+
+    def pages():
+        for i in range(5):
+            produced.append(i)
+            yield i
+
+    it = prefetch(pages(), depth=2)
+    assert next(it) == 0
+    time.sleep(0.2)
+    # one page consumed, two buffered, one waiting to be put
+    assert len(produced) <= 4
+    assert list(it) == [1, 2, 3, 4]
+
+
+def test_prefetch_reraises_and_stops_producer():
+    closed = threading.Event()
+
+    def failing():
+        try:
+            yield 1
+            raise RuntimeError('WB is down')
+        finally:
+            closed.set()
+
+    with pytest.raises(RuntimeError):
+        list(prefetch(failing(), depth=1))
+    assert closed.is_set()
+
+
+def test_prefetch_close_stops_producer():
+    produced: list[int] = []
+
+    def endless():
+        i = 0
+        while True:
+            produced.append(i)
+            yield i
+            i += 1
+
+    it = prefetch(endless(), depth=1)
+    assert next(it) == 0
+    it.close()
+    count = len(produced)
+    assert count <= 3
+    assert len(produced) == count
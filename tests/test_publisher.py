@@ -1,6 +1,8 @@
 import datetime
+import threading
+import time
 
-from sqlalchemy import select
+from sqlalchemy import event, select, update
 
 from app.core.models import Response, Review
 from app.services.publisher import PublishRepliesService
@@ -42,3 +44,209 @@ def test_publisher_publishes_draft(db, fake_wb):
         assert resp.status == 'published'
         rev = s.execute(select(Review)).scalar_one()
         assert rev.status == 'published'
+
+
+def test_publisher_concurrent_with_rescheduled_retry(file_db, fake_wb):
+    class SlowFlakyWB(type(fake_wb)):
+        def __init__(self):
+            super().__init__()
+            self.lock = threading.Lock()
+            self.active = 0
+            self.max_active = 0
+            self.failed_once = False
+
+        def reply_to_feedback(self, feedback_id, text):
+            with self.lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                flaky = feedback_id == 'WB0' and not self.failed_once
+                self.failed_once = self.failed_once or flaky
+            try:
+                time.sleep(0.02)
+                if flaky:
+                    raise RuntimeError('WB is flaky')
+                with self.lock:
+                    super().reply_to_feedback(feedback_id, text)
+            finally:
+                with self.lock:
+                    self.active -= 1
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with file_db.session_scope() as session:
+        for i in range(12):
+            review = Review(
+                wb_id=f'WB{i}', text='Ок', rating=5, created_at=aware, status='answered'
+            )
+            review.response = Response(reply_text=f'Ответ {i}', status='draft')
+            session.add(review)
+
+    wb = SlowFlakyWB()
+    svc = PublishRepliesService(wb_client=wb, workers=4, backoff_sec=0.1)
+
+    assert svc.execute() == 12
+    assert wb.max_active > 1
+    published_order = [wb_id for wb_id, _ in wb.replies]
+    assert published_order[-1] == 'WB0'  # the retry waited without blocking the others
+    with file_db.get_session() as session:
+        statuses = session.execute(select(Response.status)).scalars().all()
+    assert set(statuses) == {'published'}
+
+
+def test_publisher_persists_retries_and_marks_failed(db, fake_wb):
+    class BrokenWB(type(fake_wb)):
+        def reply_to_feedback(self, feedback_id, text):
+            if feedback_id == 'BROKEN':
+                raise RuntimeError('400 Bad Request')
+            super().reply_to_feedback(feedback_id, text)
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    later = datetime.datetime.now(datetime.UTC) + datetime.timedelta(hours=1)
+    with db.session_scope() as session:
+        for wb_id, next_attempt_at in (('BROKEN', None), ('LATER', later)):
+            review = Review(wb_id=wb_id, text='Ок', rating=5, created_at=aware, status='answered')
+            review.response = Response(
+                reply_text='Ответ', status='draft', next_attempt_at=next_attempt_at
+            )
+            session.add(review)
+
+    wb = BrokenWB()
+    svc = PublishRepliesService(wb_client=wb, max_retries=1, backoff_sec=0.01)
+
+    assert svc.execute() == 0
+    assert wb.replies == []  # LATER is not due yet
+    with db.get_session() as session:
+        broken = session.execute(
+            select(Response).join(Review).where(Review.wb_id == 'BROKEN')
+        ).scalar_one()
+        assert broken.status == 'failed'
+        assert broken.attempt_count == 2
+        assert broken.last_error == '400 Bad Request'
+
+    assert svc.execute() == 0  # failed responses are not retried by later runs
+    assert wb.replies == []
+
+    # a reply that keeps getting stuck in 'sending' (the process dies mid-post)
+    stale = datetime.datetime.now(datetime.UTC) - datetime.timedelta(minutes=1)
+    with db.session_scope() as session:
+        later = session.execute(
+            select(Response).join(Review).where(Review.wb_id == 'LATER')
+        ).scalar_one()
+        later.status, later.claimed_by, later.lease_until = 'sending', 'dead-worker', stale
+        later.attempt_count = 1
+
+    assert svc.execute() == 0
+    assert wb.replies == []
+    with db.get_session() as session:
+        assert session.execute(select(Response.status, Response.attempt_count)).all() == [
+            ('failed', 2),
+            ('failed', 2),
+        ]
+
+
+def test_publisher_loads_joined_and_batches_status_writes(db, fake_wb):
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    stale = datetime.datetime.now(datetime.UTC) - datetime.timedelta(minutes=1)
+    with db.session_scope() as session:
+        for i in range(40):
+            review = Review(
+                wb_id=f'WB{i}', text='Ок', rating=5, created_at=aware, status='answered'
+            )
+            review.response = Response(reply_text=f'Ответ {i}', status='draft')
+            if i == 0:  # claimed by a worker that died before writing the outcome back
+                review.response.status = 'sending'
+                review.response.claimed_by = 'dead-worker'
+                review.response.lease_until = stale
+            session.add(review)
+
+    statements: list[str] = []
+
+    def record(conn, cursor, statement, *args):  # noqa: ARG001
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        published = PublishRepliesService(wb_client=fake_wb, chunk_size=16).execute()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+
+    assert published == 40
+    assert sorted(wb_id for wb_id, _ in fake_wb.replies) == sorted(f'WB{i}' for i in range(40))
+    loads = [q for q in statements if q.startswith('SELECT') and 'JOIN reviews' in q]
+    assert len(loads) == 3  # one per claimed chunk of <= 16, reviews joined in
+    assert not [q for q in statements if q.startswith('SELECT') and 'FROM reviews' in q]
+    review_writes = [q for q in statements if q.startswith('UPDATE reviews')]
+    assert len(review_writes) == 1  # one write-back for the whole second
+    assert len(statements) <= published / 4  # well under one round trip per post
+    with db.get_session() as session:
+        rows = session.execute(select(Response.status, Response.attempt_count)).all()
+    assert sorted(rows) == [('published', 0)] * 39 + [('published', 1)]
+
+
+def test_publisher_skips_drafts_whose_lease_was_lost(file_db, fake_wb):
+    class HijackedWB(type(fake_wb)):
+        def reply_to_feedback(self, feedback_id, text):
+            super().reply_to_feedback(feedback_id, text)
+            # the lease expired and another worker took it over meanwhile: WB2's while
+            # it waits in hand, WB1's while it is being posted
+            hijacked = {'WB0': 'WB2', 'WB1': 'WB1'}[feedback_id]
+            with file_db.session_scope() as session:
+                session.execute(
+                    update(Response)
+                    .where(Response.review_id == Review.id, Review.wb_id == hijacked)
+                    .values(claimed_by='other-node')
+                )
+            time.sleep(0.25)  # slow post: the leases in hand are renewed meanwhile
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with file_db.session_scope() as session:
+        for i in range(3):
+            review = Review(
+                wb_id=f'WB{i}', text='Ок', rating=5, created_at=aware, status='answered'
+            )
+            review.response = Response(reply_text=f'Ответ {i}', status='draft')
+            session.add(review)
+
+    wb = HijackedWB()
+    # leases are renewed (and lost ones dropped) every third of sending_timeout
+    timeout = datetime.timedelta(seconds=0.3)
+    svc = PublishRepliesService(wb_client=wb, workers=1, sending_timeout=timeout)
+    assert svc.execute() == 1
+    assert [wb_id for wb_id, _ in wb.replies] == ['WB0', 'WB1']
+    with file_db.get_session() as session:
+        rows = session.execute(
+            select(Review.status, Response.status, Response.claimed_by)
+            .join(Response)
+            .order_by(Review.id)
+        ).all()
+    assert rows == [
+        ('published', 'published', None),
+        ('answered', 'sending', 'other-node'),  # left to the new lease holder
+        ('answered', 'sending', 'other-node'),
+    ]
+
+
+def test_publisher_stops_between_items(db, fake_wb):
+    class StoppingWB(type(fake_wb)):
+        def reply_to_feedback(self, feedback_id, text):
+            super().reply_to_feedback(feedback_id, text)
+            svc.stop()  # e.g. SIGTERM while the first post is in flight
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        for i in range(3):
+            review = Review(
+                wb_id=f'WB{i}', text='Ок', rating=5, created_at=aware, status='answered'
+            )
+            review.response = Response(reply_text=f'Ответ {i}', status='draft')
+            session.add(review)
+
+    wb = StoppingWB()
+    svc = PublishRepliesService(wb_client=wb, workers=1)
+
+    assert svc.execute() == 1
+    assert [wb_id for wb_id, _ in wb.replies] == ['WB0']
+    with db.get_session() as session:
+        rows = session.execute(
+            select(Response.status, Response.claimed_by).order_by(Response.id)
+        ).all()
+    assert rows == [('published', None), ('draft', None), ('draft', None)]
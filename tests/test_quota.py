@@ -0,0 +1,58 @@
+import datetime
+
+from app.clients import QuotaLimits, QuotaScheduler, RateLimitExceeded
+from app.core.config import settings
+from app.core.models import Response, Review
+from app.services import GenerateRepliesService, ReviewsPipeline
+
+
+def test_quota_scheduler_budgets_requests_and_tokens():
+    quota = QuotaScheduler({'m': QuotaLimits(rpm=2, tpm=1000)}, window=60)
+
+    assert quota.reserve('m', 400) == 0
+    assert quota.reserve('m', 400) == 0
+    assert 59 < quota.reserve('m', 1) <= 60  # rpm exhausted
+    assert quota.reserve('other', 10**6) == 0  # other models are unlimited by default
+
+    tight = QuotaScheduler(default=QuotaLimits(tpm=1000), window=60)
+    assert tight.try_acquire('m', 800)
+    assert not tight.try_acquire('m', 300)
+    tight.settle('m', 800, 500)  # the answer was cheaper than estimated
+    assert tight.try_acquire('m', 300)
+
+    tight.penalize('m', retry_after=5)
+    assert 4 < tight.reserve('m', 1) <= 5
+
+
+def test_replier_requeues_rate_limited_reviews(db, fake_gemini):
+    class QuotaGemini(type(fake_gemini)):
+        def __init__(self):
+            self.calls = 0
+
+        def generate(self, prompt: str, system_instruction=None) -> str:  # noqa: ARG002
+            self.calls += 1
+            if self.calls <= 2:
+                raise RateLimitExceeded(retry_after=0)
+            return super().generate(prompt)
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        for i in range(3):
+            session.add(Review(wb_id=f'WB{i}', text='Хороший товар', rating=5, created_at=aware))
+
+    gem = QuotaGemini()
+    svc = GenerateRepliesService(gemini=gem, concurrency=1)
+
+    assert svc.execute() == 3
+    assert gem.calls == 5
+    with db.get_session() as session:
+        assert session.query(Response).count() == 3
+
+
+def test_pipeline_shares_quota_limits_from_settings(monkeypatch):
+    monkeypatch.setattr(settings.gemini_quota, 'rpm', 2)
+    pipeline = ReviewsPipeline()
+
+    assert pipeline.quota.default == QuotaLimits(rpm=2, tpm=settings.gemini_quota.tpm)
+    assert pipeline.replier.quota is pipeline.quota
+    assert pipeline.replier.gem.quota is pipeline.quota
@@ -0,0 +1,47 @@
+import pytest
+
+from app.clients import RateLimitExceeded, TokenBucket, WBClient
+from app.clients.interfaces import IApiClient
+
+
+def test_token_bucket_burst_then_rate():
+    bucket = TokenBucket(rate=2.0, burst=2)
+
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.5, abs=0.05)
+
+
+def test_token_bucket_pauses_on_429():
+    bucket = TokenBucket(rate=4.0, burst=4)
+
+    bucket.observe(429, {'X-Ratelimit-Retry': '2'})
+
+    assert bucket.rate == 2.0
+    assert bucket.reserve() == pytest.approx(2.5, abs=0.05)
+
+
+class RateLimitedTransport(IApiClient):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+        self.calls = 0
+
+    def get(self, url, *, headers=None, params=None, timeout=30):  # noqa: ARG002
+        self.calls += 1
+        if self.calls <= self.failures:
+            self._notify(429, {'Retry-After': '0'})
+            raise RateLimitExceeded(retry_after=0)
+        self._notify(200, {'X-Ratelimit-Remaining': '5'})
+        return {'data': {'feedbacks': []}}
+
+    def post(self, url, *, headers=None, json=None, timeout=30):  # noqa: ARG002
+        return None
+
+
+def test_wb_client_retries_after_429():
+    transport = RateLimitedTransport(failures=2)
+    client = WBClient(token='t', transport=transport, rate_limiter=TokenBucket(rate=100, burst=1))
+
+    assert list(client.list_feedbacks(is_answered=False)) == []
+    assert transport.calls == 3
@@ -1,7 +1,11 @@
 import datetime
+import time
+
+from sqlalchemy import event, func, select
 
 from app.core.models import Response, Review
 from app.services import GenerateRepliesService
+from app.services.router import ReviewRouter
 
 
 def test_replier_creates_draft(
@@ -34,3 +38,222 @@ def test_replier_creates_draft(
         resp = session.query(Response).first()
         assert resp is not None
         assert resp.status == 'draft'
+
+
+def test_replier_concurrent_isolates_failures(db, fake_gemini):
+    class FlakyGemini(type(fake_gemini)):
+        def generate(self, prompt: str, system_instruction=None) -> str:  # noqa: ARG002
+            if 'сломалось' in prompt:
+                raise RuntimeError('Gemini is down')
+            return super().generate(prompt)
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        for i in range(5):
+            session.add(
+                Review(
+                    wb_id=f'WB{i}',
+                    text='сломалось' if i == 2 else 'Отличный товар',
+                    rating=5,
+                    created_at=aware,
+                    status='new',
+                )
+            )
+
+    svc = GenerateRepliesService(gemini=FlakyGemini(), concurrency=3, write_batch_size=2)
+
+    assert svc.execute() == 4
+
+    with db.get_session() as session:
+        statuses = dict(session.execute(select(Review.wb_id, Review.status)).all())
+        assert statuses.pop('WB2') == 'new'
+        assert set(statuses.values()) == {'answered'}
+        assert session.query(Response).count() == 4
+
+
+def test_replier_batch_mode_falls_back_for_missing(db, fake_gemini):
+    class BatchGemini(type(fake_gemini)):
+        def __init__(self):
+            self.json_prompts: list[str] = []
+            self.single_calls = 0
+
+        def generate(self, prompt: str, system_instruction=None) -> str:  # noqa: ARG002
+            self.single_calls += 1
+            return super().generate(prompt)
+
+        def generate_json(self, prompt: str, schema=None, system_instruction=None):  # noqa: ARG002
+            self.json_prompts.append(prompt)
+            return [
+                {'id': 1, 'reply': 'Спасибо!'},
+                {'id': 999, 'reply': 'чужой отзыв'},
+                {'id': 3, 'reply': ''},
+            ]
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        for i in range(1, 4):
+            session.add(Review(wb_id=f'WB{i}', text='Ок', rating=5, created_at=aware, status='new'))
+        session.add(Review(wb_id='WB4', text='Очень ' * 100, rating=2, created_at=aware))
+
+    gem = BatchGemini()
+    svc = GenerateRepliesService(gemini=gem, reviews_per_request=3, batch_max_chars=100)
+
+    assert svc.execute() == 4
+    assert len(gem.json_prompts) == 1
+    assert gem.single_calls == 3  # WB2, WB3 missing from the answer + long WB4
+
+    with db.get_session() as session:
+        replies = dict(session.execute(select(Response.review_id, Response.reply_text)).all())
+        assert replies[1] == 'Спасибо!'
+
+
+def test_replier_answers_rating_only_reviews_by_template(db, fake_gemini):
+    class CountingGemini(type(fake_gemini)):
+        calls = 0
+
+        def generate(self, prompt: str, system_instruction=None) -> str:  # noqa: ARG002
+            CountingGemini.calls += 1
+            return super().generate(prompt)
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        session.add(Review(wb_id='WB1', text=None, rating=5, created_at=aware, status='new'))
+        session.add(Review(wb_id='WB2', text='  ', rating=5, created_at=aware, status='new'))
+        session.add(Review(wb_id='WB3', text='Брак', rating=1, created_at=aware, status='new'))
+
+    svc = GenerateRepliesService(gemini=CountingGemini())
+
+    assert svc.execute() == 3
+    assert CountingGemini.calls == 1  # only WB3 has text
+
+    with db.get_session() as session:
+        rows = session.execute(select(Response.review_id, Response.model, Response.reply_text))
+        by_review = {review_id: (model, text) for review_id, model, text in rows}
+    assert by_review[1][0] == by_review[2][0] == 'template:v1'
+    assert by_review[1][1] != by_review[2][1]  # phrasings rotate
+    assert by_review[3] == ('gemini-1.5-flash', 'Тестовый ответ')
+
+
+def test_replier_selects_pending_in_keyset_chunks(db, fake_gemini):
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        for i in range(5):
+            session.add(Review(wb_id=f'WB{i}', text='Ок', rating=5, created_at=aware))
+        answered = Review(wb_id='HAS_REPLY', text='Ок', rating=5, created_at=aware)
+        answered.response = Response(reply_text='Уже есть')
+        session.add(answered)
+
+    selects: list[str] = []
+
+    def count_selects(conn, cursor, statement, *args):  # noqa: ARG001
+        if 'FROM reviews' in statement:
+            selects.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', count_selects)
+    try:
+        created = GenerateRepliesService(gemini=fake_gemini, chunk_size=2).execute()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_selects)
+
+    assert created == 5
+    pending_queries = [q for q in selects if 'LEFT OUTER JOIN responses' in q]
+    assert len(pending_queries) == 4  # 3 chunks of <= 2 + the empty one, no per-review lookups
+    assert all(q.startswith('UPDATE reviews') for q in pending_queries)  # claim and load at once
+    with db.get_session() as session:
+        assert session.query(Response).count() == 6
+
+
+def test_replier_sends_static_prompt_as_system_instruction(db, fake_gemini):
+    class InstructionGemini(type(fake_gemini)):
+        def __init__(self):
+            self.calls: list[tuple[str, str | None]] = []
+
+        def generate(self, prompt: str, system_instruction=None) -> str:
+            self.calls.append((prompt, system_instruction))
+            return super().generate(prompt)
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        session.add(Review(wb_id='WB1', text='Хороший товар', rating=4, created_at=aware))
+        session.add(Review(wb_id='WB2', text=None, rating=5, created_at=aware))
+
+    gem = InstructionGemini()
+    assert GenerateRepliesService(gemini=gem).execute() == 2
+
+    [(prompt, instruction)] = gem.calls
+    assert prompt == 'Оценка: 4/5. Отзыв: "Хороший товар"'
+    assert instruction is not None
+    assert 'поддержка бренда' in instruction
+    with db.get_session() as session:
+        versions = dict(session.execute(select(Response.model, Response.prompt_version)).all())
+    assert versions == {'gemini-1.5-flash': 'v1', 'template:v1': None}
+
+
+def test_replier_skips_reviews_leased_to_another_worker(db, fake_gemini):
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        for i in range(3):
+            session.add(Review(wb_id=f'WB{i}', text='Ок', rating=5, created_at=aware))
+
+    # another instance holds WB0 and WB1; its lease on WB1 has already expired
+    with db.session_scope() as session:
+        claimed = Review.claim(
+            session,
+            select(Review.id).where(Review.wb_id.in_(['WB0', 'WB1'])),
+            owner='other-node',
+            lease=datetime.timedelta(minutes=10),
+        )
+        assert len(claimed) == 2
+        expired = session.execute(select(Review).where(Review.wb_id == 'WB1')).scalar_one()
+        expired.lease_until = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=1)
+
+    svc = GenerateRepliesService(gemini=fake_gemini, worker_id='this-node')
+    assert svc.execute() == 2
+
+    with db.get_session() as session:
+        rows = session.execute(
+            select(Review.wb_id, Review.status, Review.claimed_by).order_by(Review.id)
+        ).all()
+    assert rows == [
+        ('WB0', 'new', 'other-node'),
+        ('WB1', 'answered', None),
+        ('WB2', 'answered', None),
+    ]
+
+
+def test_replier_renews_leases_of_a_slow_chunk(file_db, fake_gemini):
+    class SlowGemini(type(fake_gemini)):
+        def generate(self, prompt: str, system_instruction=None) -> str:  # noqa: ARG002
+            with file_db.get_session() as session:
+                expired.append(
+                    session.execute(
+                        select(func.count()).where(
+                            Review.claimed_by == svc.worker_id,
+                            Review.lease_until <= datetime.datetime.now(datetime.UTC),
+                        )
+                    ).scalar_one()
+                )
+            time.sleep(0.4)
+            return super().generate(prompt)
+
+    expired: list[int] = []
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with file_db.session_scope() as session:
+        for i in range(3):
+            session.add(Review(wb_id=f'WB{i}', text='Ок', rating=5, created_at=aware))
+
+    # the chunk takes ~1.2s, twice the lease
+    svc = GenerateRepliesService(
+        gemini=SlowGemini(), concurrency=1, lease=datetime.timedelta(seconds=0.6)
+    )
+    assert svc.execute() == 3
+    assert expired == [0, 0, 0]
+
+
+def test_replier_default_client_has_per_call_timeout():
+    svc = GenerateRepliesService()
+    assert svc.gem.timeout == 30.0
+    assert GenerateRepliesService(gemini_timeout=5).gem.timeout == 5
+    # the context cache is on for the router tiers too (skipped for short instructions)
+    clients = [svc.gem, *ReviewRouter.create().clients.values()]
+    assert all(c.context_cache and c.context_cache_min_tokens == 32_768 for c in clients)
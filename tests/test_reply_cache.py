@@ -0,0 +1,54 @@
+import datetime
+
+from sqlalchemy import func, select
+
+from app.core.models import ReplyCacheItem, Response, Review
+from app.services import GenerateRepliesService
+from app.services.reply_cache import ReplyCache
+
+
+def test_reply_cache_collects_variants_then_rotates(db):
+    cache = ReplyCache(variants=2, max_entries=1)
+    key = cache.key('m', 5, 'Всё отлично, спасибо!')
+
+    assert key == cache.key('m', 5, '  всё ОТЛИЧНО спасибо ')
+    assert key != cache.key('m', 4, 'Всё отлично, спасибо!')
+    assert cache.key('m', 5, 'x' * 500) is None
+
+    with db.session_scope() as session:
+        assert cache.get(session, key) is None
+        cache.put(session, key, model='m', rating=5, reply_text='A')
+        assert cache.get(session, key) is None
+        cache.put(session, key, model='m', rating=5, reply_text='B')
+
+    fresh = ReplyCache(variants=2, max_entries=1)  # DB tier survives the process
+    with db.session_scope() as session:
+        assert [fresh.get(session, key) for _ in range(3)] == ['A', 'B', 'A']
+        fresh.maintain(session)
+
+    assert fresh.stats.db_hits == 1
+    assert fresh.stats.memory_hits == 2
+    with db.get_session() as session:
+        assert session.execute(select(func.count(ReplyCacheItem.id))).scalar_one() == 1
+
+
+def test_replier_answers_repeats_from_cache(db, fake_gemini):
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        for i in range(3):
+            session.add(Review(wb_id=f'WB{i}', text='Спасибо!', rating=5, created_at=aware))
+
+    cache = ReplyCache(variants=1)
+    svc = GenerateRepliesService(gemini=fake_gemini, cache=cache, model_name='m')
+    assert svc.execute() == 3
+
+    with db.session_scope() as session:
+        session.add(Review(wb_id='WB9', text='спасибо', rating=5, created_at=aware))
+    assert svc.execute() == 1
+
+    assert cache.stats.hits == 1
+    with db.get_session() as session:
+        models = session.execute(
+            select(Response.model).join(Review).where(Review.wb_id == 'WB9')
+        ).scalar_one()
+        assert models == 'cache:m'
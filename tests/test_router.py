@@ -0,0 +1,54 @@
+import datetime
+
+from sqlalchemy import select
+
+from app.core.models import Response, Review
+from app.services import GenerateRepliesService
+from app.services.router import ReviewRouter
+
+
+def test_router_sends_complex_reviews_to_strong_tier_with_fallback(db, fake_gemini):
+    class TierGemini(type(fake_gemini)):
+        def __init__(self, model_name: str, fail: bool = False):
+            self.model_name = model_name
+            self.fail = fail
+            self.prompts: list[str] = []
+
+        def generate(self, prompt: str, system_instruction=None) -> str:  # noqa: ARG002
+            self.prompts.append(prompt)
+            if self.fail and 'Сломался' in prompt:
+                raise RuntimeError('strong tier is down')
+            return f'ответ {self.model_name}'
+
+    light, strong = TierGemini('light-model'), TierGemini('strong-model', fail=True)
+    router = ReviewRouter(light, strong, long_text_chars=50)
+
+    assert router.classify('Спасибо!', 5) == 'light'
+    assert router.classify('Спасибо!', 2) == 'strong'
+    assert router.classify('Пришёл бракованный', 5) == 'strong'
+    assert router.classify('Хорошо ' * 10, 4) == 'strong'
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        session.add(Review(wb_id='EASY', text='Спасибо!', rating=5, created_at=aware))
+        session.add(
+            Review(wb_id='HARD', text='Полный брак, верните деньги', rating=1, created_at=aware)
+        )
+        session.add(Review(wb_id='DOWN', text='Сломался через день', rating=1, created_at=aware))
+
+    svc = GenerateRepliesService(gemini=fake_gemini, router=router)
+    assert svc.execute() == 3
+
+    with db.get_session() as session:
+        models = dict(
+            session.execute(
+                select(Review.wb_id, Response.model).join(Response, Response.review_id == Review.id)
+            ).all()
+        )
+    assert models == {'EASY': 'light-model', 'HARD': 'strong-model', 'DOWN': 'light-model'}
+
+    report = router.report()
+    assert report['strong']['requests'] == 2
+    assert report['strong']['failures'] == report['strong']['fallbacks'] == 1
+    assert report['light']['requests'] == 2
+    assert report['light']['p50'] is not None
@@ -0,0 +1,53 @@
+import datetime
+
+from sqlalchemy import select
+
+from app.core.models import Response, Review
+from app.services import GenerateRepliesService
+from app.services.similarity import SimilarityIndex
+
+
+def test_similarity_index_reuses_paraphrase_and_persists(db, fake_gemini, tmp_path):
+    class CountingGemini(type(fake_gemini)):
+        calls = 0
+
+        def generate(self, prompt: str, system_instruction=None) -> str:  # noqa: ARG002
+            CountingGemini.calls += 1
+            return super().generate(prompt)
+
+    aware = datetime.datetime(2025, 1, 1, tzinfo=datetime.UTC)
+    with db.session_scope() as session:
+        review = Review(
+            wb_id='OLD',
+            text='Пришло быстро, всё подошло',
+            rating=5,
+            created_at=aware,
+            status='answered',
+        )
+        review.response = Response(reply_text='Спасибо за отзыв!', model='gemini-1.5-flash')
+        session.add(review)
+        session.add(Review(wb_id='WB1', text='быстро пришло, подошло', rating=5, created_at=aware))
+        session.add(Review(wb_id='WB2', text='быстро пришло, подошло', rating=1, created_at=aware))
+        session.add(Review(wb_id='WB3', text='Порвалось после стирки', rating=5, created_at=aware))
+
+    path = tmp_path / 'similarity.idx'
+    svc = GenerateRepliesService(gemini=CountingGemini(), similarity=SimilarityIndex(path))
+
+    assert svc.execute() == 3
+    assert CountingGemini.calls == 2  # other rating bucket + unrelated text
+
+    with db.get_session() as session:
+        models = dict(
+            session.execute(
+                select(Review.wb_id, Response.model).join(Response, Response.review_id == Review.id)
+            ).all()
+        )
+    assert models['WB1'] == 'similar:gemini-1.5-flash'
+    assert models['WB2'] == models['WB3'] == 'gemini-1.5-flash'
+
+    restored = SimilarityIndex(path)
+    assert len(restored) == 3  # OLD + two fresh LLM replies, not the reused one
+    assert restored.last_response_id == 4
+    match = restored.query('пришло быстро всё подошло', 5)
+    assert match is not None
+    assert match.reply_text == 'Спасибо за отзыв!'
@@ -0,0 +1,63 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.clients import RateLimitExceeded
+from app.clients.interfaces import PooledRequestsClient
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path.startswith('/limited'):
+            self.send_response(429)
+            self.send_header('Retry-After', '3')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = gzip.compress(json.dumps({'data': {'port': self.client_address[1]}}).encode())
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *_):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_pooled_client_reuses_connection(server_url):
+    statuses = []
+    client = PooledRequestsClient(pool_size=2)
+    client.add_response_hook(lambda status, _: statuses.append(status))
+
+    first = client.get(f'{server_url}/feedbacks')
+    second = client.get(f'{server_url}/feedbacks')
+    assert client.post(f'{server_url}/answer', json={'id': '1'}) is None
+    with pytest.raises(RateLimitExceeded) as exc:
+        client.get(f'{server_url}/limited')
+    client.close()
+
+    assert first['data']['port'] == second['data']['port']
+    assert statuses == [200, 200, 204, 429]
+    assert exc.value.retry_after == 3
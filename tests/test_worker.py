@@ -0,0 +1,75 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import select
+
+from app.core.models import Response
+from app.core.models.db_helper import Listener
+from app.services import FetchNewReviewsService, GenerateRepliesService, StageWorker
+from app.services.worker import NEW_REVIEWS_CHANNEL
+
+
+def test_worker_wakes_up_on_notify_instead_of_polling(file_db, fake_wb, fake_gemini):
+    replier = GenerateRepliesService(gemini=fake_gemini)
+    worker = StageWorker(replier, NEW_REVIEWS_CHANNEL, poll_interval=30)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    try:
+        time.sleep(0.2)  # the first, empty run
+        started = time.monotonic()
+        assert FetchNewReviewsService(fake_wb).execute() == 1
+
+        drafted = None
+        while drafted is None and time.monotonic() - started < 5:
+            with file_db.get_session() as session:
+                drafted = session.execute(select(Response.reply_text)).scalar_one_or_none()
+            time.sleep(0.02)
+        assert drafted == 'Тестовый ответ'
+        assert time.monotonic() - started < 2  # well before the 30s poll
+    finally:
+        worker.stop()
+        thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_worker_survives_stage_and_listener_failures(file_db, monkeypatch):
+    class FlakyStage:
+        def __init__(self) -> None:
+            self.runs = 0
+
+        def execute(self) -> int:
+            self.runs += 1
+            if self.runs == 1:
+                raise RuntimeError('could not serialize access')  # e.g. a transient DB error
+            if self.runs == 4:
+                worker.stop()
+            return 1
+
+        def stop(self) -> None:
+            pass
+
+    opened = []
+
+    @contextmanager
+    def flaky_listen(channel: str):
+        opened.append(channel)
+
+        def wait(timeout: float) -> list[str]:
+            if len(opened) == 1:
+                raise ConnectionError('server closed the connection unexpectedly')
+            time.sleep(timeout)
+            return []
+
+        yield Listener(wait)
+
+    monkeypatch.setattr(file_db, 'listen', flaky_listen)
+    stage = FlakyStage()
+    worker = StageWorker(stage, NEW_REVIEWS_CHANNEL, poll_interval=0.05, reconnect_sec=0.01)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert stage.runs == 4  # failed run, reconnect, two polls
+    assert len(opened) == 2